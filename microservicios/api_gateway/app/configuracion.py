@@ -0,0 +1,21 @@
+"""
+Configuración del API Gateway - PATRON SINGLETON
+"""
+
+import os
+
+class Configuration:
+    _instance = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Configuration, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+    
+    def _initialize(self):
+        # Debe coincidir con el secreto del servicio de autenticación
+        self.JWT_SECRET = os.getenv("JWT_SECRET", "pos_core_secret_key_2024")
+        self.JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+
+configuration = Configuration()
\ No newline at end of file
@@ -5,21 +5,45 @@ Proporciona una interfaz unificada para todos los microservicios
 
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+import asyncio
 import httpx
+import jwt
 import logging
+import time
 from datetime import datetime
 from typing import Optional
+from configuracion import configuration
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida: un cliente HTTP (y su pool de conexiones) por microservicio"""
+    app.state.clients = {
+        nombre: httpx.AsyncClient(
+            base_url=url,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100, keepalive_expiry=30.0),
+            timeout=HTTP_TIMEOUTS[nombre]
+        )
+        for nombre, url in SERVICIOS.items()
+    }
+    app.state.breakers = {nombre: CircuitBreaker() for nombre in SERVICIOS}
+    yield
+    await asyncio.gather(*(client.aclose() for client in app.state.clients.values()))
+
 # PATRON MVC - Controller principal
 app = FastAPI(
     title="API Gateway - POS Core",
     description="Gateway unificado para microservicios POS Core",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Configuración CORS
@@ -44,32 +68,88 @@ SERVICIOS = {
     "impresion": "http://servicio_impresion:8006"
 }
 
+# Timeouts por servicio: los reportes agregan datos y pueden tardar más
+HTTP_TIMEOUTS = {
+    "auth": httpx.Timeout(10.0, connect=5.0),
+    "inventario": httpx.Timeout(30.0, connect=5.0),
+    "productos": httpx.Timeout(30.0, connect=5.0),
+    "ventas": httpx.Timeout(30.0, connect=5.0),
+    "reportes": httpx.Timeout(60.0, connect=5.0),
+    "impresion": httpx.Timeout(30.0, connect=5.0)
+}
+
+# PATRON SINGLETON: Decodificador JWT y algoritmos permitidos, creados una sola vez
+_jwt = jwt.PyJWT()
+_ALGORITMOS_JWT = [configuration.JWT_ALGORITHM]
+
+# PATRON STATE: Circuit breaker por microservicio (cerrado -> abierto -> semiabierto)
+class CircuitBreaker:
+    """Corta el tráfico hacia un servicio tras fallos consecutivos de red"""
+    
+    def __init__(self, umbral_fallos: int = 5, tiempo_reset: float = 10.0):
+        self.umbral_fallos = umbral_fallos
+        self.tiempo_reset = tiempo_reset
+        self._fallos = 0
+        self._abierto_desde: Optional[float] = None
+    
+    def permitir(self) -> bool:
+        """Indica si se puede enviar una petición al servicio"""
+        if self._abierto_desde is None:
+            return True
+        ahora = time.monotonic()
+        if ahora - self._abierto_desde >= self.tiempo_reset:
+            # Semiabierto: se deja pasar una única petición de prueba por ventana
+            self._abierto_desde = ahora
+            return True
+        return False
+    
+    def registrar_exito(self):
+        self._fallos = 0
+        self._abierto_desde = None
+    
+    def registrar_fallo(self):
+        self._fallos += 1
+        if self._fallos >= self.umbral_fallos:
+            self._abierto_desde = time.monotonic()
+
+# Headers hop-by-hop (RFC 7230) que un proxy no debe reenviar
+_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade"
+})
+# El host lo fija el cliente HTTP según el destino; content-length se conserva
+# porque el cuerpo se reenvía sin modificar
+_HEADERS_NO_REENVIABLES = _HOP_HEADERS | {"host"}
+
 # PATRON STRATEGY: Servicio de validación de tokens
 class ServicioAutenticacion:
     """Strategy para validación de tokens JWT"""
     
     @staticmethod
-    async def validar_token(token: str) -> Optional[dict]:
-        """Valida un token JWT con el servicio de autenticación"""
+    def validar_token(token: str) -> Optional[dict]:
+        """Valida localmente la firma y expiración de un token JWT"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{SERVICIOS['auth']}/api/v1/auth/me",
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=10.0
-                )
-                if response.status_code == 200:
-                    return response.json()
-                return None
-        except Exception as e:
-            logger.error(f"Error validando token: {e}")
+            payload = _jwt.decode(
+                token,
+                configuration.JWT_SECRET,
+                algorithms=_ALGORITMOS_JWT,
+                options={"require": ["exp"]}
+            )
+        except jwt.PyJWTError:
             return None
+        
+        # PATRON ADAPTER: Claims del token -> datos de usuario
+        return {
+            "id": payload.get("user_id"),
+            "email": payload.get("sub"),
+            "rol": payload.get("rol")
+        }
 
 # PATRON DEPENDENCY INJECTION
 async def obtener_usuario_actual(credentials: HTTPBearer = Depends(security)):
     """Dependency Injection: Obtiene usuario actual del token"""
     token = credentials.credentials
-    usuario = await ServicioAutenticacion.validar_token(token)
+    usuario = ServicioAutenticacion.validar_token(token)
     if not usuario:
         raise HTTPException(status_code=401, detail="Token inválido o expirado")
     return usuario
@@ -86,25 +166,28 @@ async def raiz():
         "microservicios": list(SERVICIOS.keys())
     }
 
+async def _verificar_servicio(nombre: str, client: httpx.AsyncClient):
+    """Consulta el health check de un microservicio"""
+    try:
+        response = await client.get("/health", timeout=5.0)
+        return nombre, {
+            "estado": "saludable" if response.status_code == 200 else "error",
+            "status_code": response.status_code
+        }
+    except Exception as e:
+        return nombre, {
+            "estado": "no disponible",
+            "error": str(e)
+        }
+
 @app.get("/health")
 async def salud():
     """Health check del gateway y servicios dependientes"""
-    servicios_status = {}
-    
-    # Verificar estado de cada microservicio
-    for nombre, url in SERVICIOS.items():
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{url}/health", timeout=5.0)
-                servicios_status[nombre] = {
-                    "estado": "saludable" if response.status_code == 200 else "error",
-                    "status_code": response.status_code
-                }
-        except Exception as e:
-            servicios_status[nombre] = {
-                "estado": "no disponible",
-                "error": str(e)
-            }
+    # Verificar todos los microservicios en paralelo
+    resultados = await asyncio.gather(
+        *(_verificar_servicio(nombre, client) for nombre, client in app.state.clients.items())
+    )
+    servicios_status = dict(resultados)
     
     return {
         "estado": "saludable",
@@ -118,6 +201,17 @@ async def health_completo():
     """Health check extendido para todos los servicios"""
     return await salud()
 
+def _respuesta_streaming(response: httpx.Response) -> StreamingResponse:
+    """PATRON ADAPTER: Reenvía la respuesta del microservicio sin decodificarla"""
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS}
+    
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=headers,
+        background=BackgroundTask(response.aclose)
+    )
+
 # PATRON PROXY: Routing dinámico a microservicios
 @app.api_route("/api/{servicio}/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def proxy_request(
@@ -139,66 +233,66 @@ async def proxy_request(
             detail=f"Servicio '{servicio}' no encontrado. Servicios disponibles: {list(SERVICIOS.keys())}"
         )
     
-    # Construir URL destino
-    url_destino = f"{SERVICIOS[servicio]}/{path}"
-    
     # PATRON ADAPTER: Preparar headers para el reenvío
-    headers = {}
-    for key, value in request.headers.items():
-        # Filtrar headers que no deben reenviarse
-        if key.lower() not in ["host", "content-length"]:
-            headers[key] = value
+    headers = {k: v for k, v in request.headers.items() if k not in _HEADERS_NO_REENVIABLES}
     
     # Mantener la autenticación
     if "authorization" in request.headers:
         headers["authorization"] = request.headers["authorization"]
     
     # Agregar headers de trazabilidad
-    headers["x-user-id"] = usuario.get("id", "unknown")
-    headers["x-user-email"] = usuario.get("email", "unknown")
+    # Un claim ausente llega como None y httpx rechaza cabeceras None (o no textuales)
+    headers["x-user-id"] = str(usuario.get("id") or "unknown")
+    headers["x-user-email"] = str(usuario.get("email") or "unknown")
     
     logger.info(f"Proxying {request.method} {servicio}/{path} para usuario {usuario.get('email')}")
     
     # PATRON PROXY: Reenviar request al microservicio
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.request(
-                method=request.method,
-                url=url_destino,
-                headers=headers,
-                params=dict(request.query_params),
-                content=await request.body(),
-                timeout=30.0  # Timeout para evitar bloqueos
-            )
-            
-            # PATRON ADAPTER: Adaptar respuesta
-            if response.status_code >= 400:
-                logger.warning(f"Error {response.status_code} from {servicio}: {response.text}")
-            
-            return JSONResponse(
-                content=response.json() if response.content else {},
-                status_code=response.status_code,
-                headers=dict(response.headers)
-            )
-            
-        except httpx.ConnectError:
-            logger.error(f"No se pudo conectar con el servicio: {servicio}")
-            raise HTTPException(
-                status_code=503, 
-                detail=f"Servicio {servicio} no disponible temporalmente"
-            )
-        except httpx.TimeoutException:
-            logger.error(f"Timeout al conectar con: {servicio}")
-            raise HTTPException(
-                status_code=504,
-                detail=f"Timeout del servicio {servicio}"
-            )
-        except Exception as e:
-            logger.error(f"Error interno comunicando con {servicio}: {e}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error interno del servidor: {str(e)}"
-            )
+    breaker = request.app.state.breakers[servicio]
+    if not breaker.permitir():
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servicio {servicio} no disponible temporalmente"
+        )
+    
+    client = request.app.state.clients[servicio]
+    try:
+        peticion = client.build_request(
+            method=request.method,
+            url=f"/{path}",
+            headers=headers,
+            params=dict(request.query_params),
+            content=request.stream()
+        )
+        response = await client.send(peticion, stream=True)
+        breaker.registrar_exito()
+        
+        # PATRON ADAPTER: Adaptar respuesta
+        if response.status_code >= 400:
+            logger.warning(f"Error {response.status_code} from {servicio}")
+        
+        return _respuesta_streaming(response)
+        
+    except httpx.ConnectError:
+        breaker.registrar_fallo()
+        logger.error(f"No se pudo conectar con el servicio: {servicio}")
+        raise HTTPException(
+            status_code=503, 
+            detail=f"Servicio {servicio} no disponible temporalmente"
+        )
+    except httpx.TimeoutException:
+        breaker.registrar_fallo()
+        logger.error(f"Timeout al conectar con: {servicio}")
+        raise HTTPException(
+            status_code=504,
+            detail=f"Timeout del servicio {servicio}"
+        )
+    except Exception as e:
+        logger.error(f"Error interno comunicando con {servicio}: {e}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Error interno del servidor: {str(e)}"
+        )
 
 # Rutas públicas (sin autenticación)
 @app.post("/api/auth/login")
@@ -216,36 +310,44 @@ async def proxy_request_publico(servicio: str, path: str, request: Request):
     if servicio not in SERVICIOS:
         raise HTTPException(status_code=404, detail="Servicio no encontrado")
     
-    url_destino = f"{SERVICIOS[servicio]}/{path}"
+    headers = {k: v for k, v in request.headers.items() if k not in _HEADERS_NO_REENVIABLES}
     
-    headers = {}
-    for key, value in request.headers.items():
-        if key.lower() not in ["host", "content-length"]:
-            headers[key] = value
+    breaker = request.app.state.breakers[servicio]
+    if not breaker.permitir():
+        raise HTTPException(status_code=503, detail="Servicio no disponible")
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.request(
-                method=request.method,
-                url=url_destino,
-                headers=headers,
-                params=dict(request.query_params),
-                content=await request.body(),
-                timeout=30.0
-            )
-            
-            return JSONResponse(
-                content=response.json() if response.content else {},
-                status_code=response.status_code,
-                headers=dict(response.headers)
-            )
-            
-        except httpx.ConnectError:
-            raise HTTPException(status_code=503, detail="Servicio no disponible")
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            raise HTTPException(status_code=500, detail="Error interno del servidor")
+    client = request.app.state.clients[servicio]
+    try:
+        peticion = client.build_request(
+            method=request.method,
+            url=f"/{path}",
+            headers=headers,
+            params=dict(request.query_params),
+            content=request.stream()
+        )
+        response = await client.send(peticion, stream=True)
+        breaker.registrar_exito()
+        
+        return _respuesta_streaming(response)
+        
+    except httpx.ConnectError:
+        breaker.registrar_fallo()
+        raise HTTPException(status_code=503, detail="Servicio no disponible")
+    except httpx.TimeoutException:
+        breaker.registrar_fallo()
+        raise HTTPException(status_code=504, detail="Timeout del servicio")
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
@@ -4,32 +4,50 @@ Servicio de Autenticación - PATRON MVC + GOF
 
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.security import HTTPBearer
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+from contextlib import asynccontextmanager
 from bson import ObjectId
 from datetime import datetime
 from configuracion import configuration
 from modelos import UsuarioCrear, Usuario, LoginRequest, TokenResponse
-from seguridad import obtener_password_hash, verificar_password, crear_token_acceso, verificar_token_acceso
+from seguridad import obtener_password_hash_async, verificar_password_async, crear_token_acceso, verificar_token_acceso
 from repositorio import UsuarioRepository
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida: asegura los índices antes de atender peticiones"""
+    usuarios = get_database()[configuration.COLECCION_USUARIOS]
+    await usuarios.create_index("email", unique=True)
+    yield
+    mongo_client.close()
+
 # PATRON MVC - Controller principal
 app = FastAPI(
     title="Servicio de Autenticación - POS Core",
     description="Microservicio para gestión de usuarios y autenticación",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # PATRON STRATEGY: Esquema de autenticación Bearer
 security = HTTPBearer()
 
+# PATRON SINGLETON: Un único cliente MongoDB (y su pool de conexiones) por proceso
+mongo_client = AsyncIOMotorClient(
+    configuration.MONGODB_URL,
+    maxPoolSize=configuration.MONGO_MAX_POOL_SIZE,
+    minPoolSize=configuration.MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=configuration.MONGO_SERVER_SELECTION_TIMEOUT_MS
+)
+
 # PATRON DEPENDENCY INJECTION: Factory para base de datos
 def get_database():
-    client = MongoClient(configuration.MONGODB_URL)
-    return client[configuration.BASE_DATOS]
+    return mongo_client[configuration.BASE_DATOS]
 
 def get_usuario_repository():
     db = get_database()
@@ -54,37 +72,36 @@ async def salud():
 @app.post("/api/v1/auth/registro", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
 async def registrar_usuario(usuario: UsuarioCrear, repo: UsuarioRepository = Depends(get_usuario_repository)):
     """PATRON MVC - Controller: Endpoint de registro"""
-    # Validar usuario existente
-    usuario_existente = await repo.obtener_por_email(usuario.email)
-    if usuario_existente:
-        raise HTTPException(status_code=400, detail="El usuario ya existe")
-    
     # PATRON FACTORY: Crear usuario
-    usuario_data = usuario.dict()
-    usuario_data["password"] = obtener_password_hash(usuario.password)
+    usuario_data = usuario.model_dump()
+    usuario_data["password"] = await obtener_password_hash_async(usuario.password)
     usuario_data["fecha_creacion"] = datetime.now()
     usuario_data["activo"] = True
     
-    usuario_id = await repo.crear(usuario_data)
-    usuario_creado = await repo.obtener_por_id(usuario_id)
+    # El índice único sobre email rechaza usuarios existentes
+    try:
+        usuario_id = await repo.crear(usuario_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="El usuario ya existe")
     
+    # El documento insertado ya se conoce: no se vuelve a leer de MongoDB
     # PATRON FACTORY: Crear token
     token = crear_token_acceso({
-        "sub": usuario_creado["email"],
-        "user_id": str(usuario_creado["_id"]),
-        "rol": usuario_creado["rol"]
+        "sub": usuario_data["email"],
+        "user_id": usuario_id,
+        "rol": usuario_data["rol"]
     })
     
     return TokenResponse(
         access_token=token,
         token_type="bearer",
         usuario=Usuario(
-            id=str(usuario_creado["_id"]),
-            email=usuario_creado["email"],
-            nombre=usuario_creado["nombre"],
-            rol=usuario_creado["rol"],
-            fecha_creacion=usuario_creado["fecha_creacion"],
-            activo=usuario_creado["activo"]
+            id=usuario_id,
+            email=usuario_data["email"],
+            nombre=usuario_data["nombre"],
+            rol=usuario_data["rol"],
+            fecha_creacion=usuario_data["fecha_creacion"],
+            activo=usuario_data["activo"]
         )
     )
 
@@ -92,7 +109,7 @@ async def registrar_usuario(usuario: UsuarioCrear, repo: UsuarioRepository = Dep
 async def login(login_data: LoginRequest, repo: UsuarioRepository = Depends(get_usuario_repository)):
     """PATRON MVC - Controller: Endpoint de login"""
     usuario = await repo.obtener_por_email(login_data.email)
-    if not usuario or not verificar_password(login_data.password, usuario["password"]):
+    if not usuario or not await verificar_password_async(login_data.password, usuario["password"]):
         raise HTTPException(status_code=401, detail="Credenciales incorrectas")
     
     if not usuario.get("activo", True):
@@ -139,5 +156,13 @@ async def obtener_usuario_actual(credentials: HTTPBearer = Depends(security), re
     )
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
@@ -2,33 +2,41 @@
 Repositorio de usuarios - PATRON REPOSITORY
 """
 
-from pymongo import MongoClient
+from functools import lru_cache
+from typing import Optional
 from bson import ObjectId
 from configuracion import configuration
 
+@lru_cache(maxsize=4096)
+def _to_oid(valor: str) -> Optional[ObjectId]:
+    """Convierte un ID en texto a ObjectId (None si no es válido), cacheando IDs repetidos"""
+    return ObjectId(valor) if ObjectId.is_valid(valor) else None
+
 class UsuarioRepository:
-    """Repository Pattern: Abstrae el acceso a datos de usuarios"""
+    """Repository Pattern: Abstrae el acceso a datos de usuarios (Motor, asíncrono)"""
     
     def __init__(self, database):
         self.collection = database[configuration.COLECCION_USUARIOS]
     
     async def crear(self, usuario_data: dict) -> str:
-        result = self.collection.insert_one(usuario_data)
+        result = await self.collection.insert_one(usuario_data)
         return str(result.inserted_id)
     
     async def obtener_por_id(self, usuario_id: str):
-        if not ObjectId.is_valid(usuario_id):
+        oid = _to_oid(usuario_id)
+        if oid is None:
             return None
-        return self.collection.find_one({"_id": ObjectId(usuario_id)})
+        return await self.collection.find_one({"_id": oid})
     
     async def obtener_por_email(self, email: str):
-        return self.collection.find_one({"email": email})
+        return await self.collection.find_one({"email": email})
     
     async def actualizar(self, usuario_id: str, datos_actualizacion: dict) -> bool:
-        if not ObjectId.is_valid(usuario_id):
+        oid = _to_oid(usuario_id)
+        if oid is None:
             return False
-        result = self.collection.update_one(
-            {"_id": ObjectId(usuario_id)},
+        result = await self.collection.update_one(
+            {"_id": oid},
             {"$set": datos_actualizacion}
         )
         return result.modified_count > 0
\ No newline at end of file
@@ -2,39 +2,82 @@
 Servicios de seguridad - PATRON STRATEGY para algoritmos
 """
 
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from typing import Optional
+import asyncio
+import os
+import time
+import bcrypt
 import jwt
-from passlib.context import CryptContext
 from configuracion import configuration
 
-# PATRON STRATEGY: Diferentes esquemas de hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pool dedicado para bcrypt: el trabajo de CPU no compite con el executor por defecto
+_executor_hash = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
 
+# PATRON SINGLETON: Codificador JWT y algoritmos permitidos, creados una sola vez
+_jwt = jwt.PyJWT()
+_ALGORITMOS = [configuration.JWT_ALGORITHM]
+_DURACION_TOKEN_SEGUNDOS = 24 * 3600
+
+# Cache LRU de tokens ya verificados: token -> (payload, exp)
+_tokens_verificados: "OrderedDict[str, tuple]" = OrderedDict()
+_MAX_TOKENS_CACHE = 1024
+
+# PATRON STRATEGY: bcrypt como único esquema de hashing, usado sin passlib
 def verificar_password(plain_password: str, hashed_password: str) -> bool:
     """Strategy para verificación de contraseñas"""
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:
+        # Hash almacenado con formato inválido
+        return False
 
 def obtener_password_hash(password: str) -> str:
     """Strategy para hashing de contraseñas"""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=configuration.BCRYPT_ROUNDS)).decode()
+
+async def verificar_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verifica la contraseña en un hilo para no bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor_hash, verificar_password, plain_password, hashed_password)
+
+async def obtener_password_hash_async(password: str) -> str:
+    """Calcula el hash en un hilo para no bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor_hash, obtener_password_hash, password)
 
 def crear_token_acceso(data: dict, expires_delta: Optional[timedelta] = None):
     """PATRON FACTORY: Crea tokens JWT"""
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(hours=24)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, configuration.JWT_SECRET, algorithm=configuration.JWT_ALGORITHM)
+    duracion = expires_delta.total_seconds() if expires_delta else _DURACION_TOKEN_SEGUNDOS
+    to_encode["exp"] = int(time.time() + duracion)
+    encoded_jwt = _jwt.encode(to_encode, configuration.JWT_SECRET, algorithm=configuration.JWT_ALGORITHM)
     return encoded_jwt
 
 def verificar_token_acceso(token: str):
     """Strategy para verificación de tokens"""
+    en_cache = _tokens_verificados.get(token)
+    if en_cache is not None:
+        payload, exp = en_cache
+        if exp > time.time():
+            _tokens_verificados.move_to_end(token)
+            return payload
+        del _tokens_verificados[token]
+    
     try:
-        payload = jwt.decode(token, configuration.JWT_SECRET, algorithms=[configuration.JWT_ALGORITHM])
-        return payload
+        payload = _jwt.decode(
+            token,
+            configuration.JWT_SECRET,
+            algorithms=_ALGORITMOS,
+            options={"require": ["exp"]}
+        )
     except jwt.PyJWTError:
-        return None
\ No newline at end of file
+        return None
+    
+    # Solo se guardan tokens válidos; el exp se vuelve a comprobar en cada acierto
+    _tokens_verificados[token] = (payload, payload["exp"])
+    if len(_tokens_verificados) > _MAX_TOKENS_CACHE:
+        _tokens_verificados.popitem(last=False)
+    return payload
\ No newline at end of file
@@ -15,5 +15,7 @@ class Configuration:
     
     def _initialize(self):
         self.REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+        # Segundos de espera simulada por trabajo (0 = sin simulación)
+        self.SIMULATE_PRINT_DELAY = float(os.getenv("SIMULATE_PRINT_DELAY", "0"))
 
 configuration = Configuration()
\ No newline at end of file
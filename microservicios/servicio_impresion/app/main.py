@@ -2,9 +2,13 @@
 Servicio de Impresión - PATRON MVC + COMMAND
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
 import logging
+import os
+import socket
 from configuracion import configuration
 from modelos import TicketRequest, ReporteRequest, ImpresionResponse
 from servicios import ServicioImpresion
@@ -12,16 +16,32 @@ from servicios import ServicioImpresion
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# PATRON SINGLETON: Servicio de impresión global
+servicio_impresion = ServicioImpresion()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida: arranca el worker del stream de impresión y cierra Redis al apagar"""
+    await servicio_impresion.inicializar_cola()
+    # Un consumidor por proceso: con varios workers el grupo reparte los trabajos
+    consumidor = f"{socket.gethostname()}-{os.getpid()}"
+    worker = asyncio.create_task(servicio_impresion.consumir(consumidor))
+    yield
+    worker.cancel()
+    try:
+        await worker
+    except asyncio.CancelledError:
+        pass
+    await servicio_impresion.cerrar()
+
 # PATRON MVC - Controller principal
 app = FastAPI(
     title="Servicio de Impresión - POS Core",
     description="Microservicio para gestión de impresión de tickets y reportes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# PATRON SINGLETON: Servicio de impresión global
-servicio_impresion = ServicioImpresion()
-
 @app.get("/")
 async def raiz():
     return {
@@ -39,49 +59,35 @@ async def salud():
     }
 
 @app.post("/api/v1/imprimir/ticket", response_model=ImpresionResponse)
-async def imprimir_ticket(ticket: TicketRequest, background_tasks: BackgroundTasks):
+async def imprimir_ticket(ticket: TicketRequest):
     """PATRON MVC - Controller: Endpoint para imprimir ticket"""
     try:
         # PATRON COMMAND: Crear comando de impresión
-        trabajo_id = servicio_impresion.encolar_trabajo("ticket_venta", ticket.dict())
-        
-        # Procesar en background
-        trabajo = {
-            "id": trabajo_id,
-            "tipo": "ticket_venta",
-            "datos": ticket.dict(),
-            "timestamp": datetime.now().isoformat()
-        }
-        background_tasks.add_task(servicio_impresion.procesar_impresion, trabajo)
+        ahora = datetime.now()
+        # El worker del stream lo procesa en segundo plano
+        trabajo_id = await servicio_impresion.encolar_trabajo("ticket_venta", ticket.model_dump())
         
         return ImpresionResponse(
             mensaje="Ticket enviado a impresión",
             id_trabajo=trabajo_id,
-            timestamp=datetime.now()
+            timestamp=ahora
         )
     except Exception as e:
         logger.error(f"Error al imprimir ticket: {e}")
         raise HTTPException(status_code=500, detail=f"Error al imprimir: {str(e)}")
 
 @app.post("/api/v1/imprimir/reporte", response_model=ImpresionResponse)
-async def imprimir_reporte(reporte: ReporteRequest, background_tasks: BackgroundTasks):
+async def imprimir_reporte(reporte: ReporteRequest):
     """PATRON MVC - Controller: Endpoint para imprimir reporte"""
     try:
         # PATRON COMMAND: Crear comando de impresión de reporte
-        trabajo_id = servicio_impresion.encolar_trabajo("reporte", reporte.dict())
-        
-        trabajo = {
-            "id": trabajo_id,
-            "tipo": "reporte",
-            "datos": reporte.dict(),
-            "timestamp": datetime.now().isoformat()
-        }
-        background_tasks.add_task(servicio_impresion.procesar_impresion, trabajo)
+        ahora = datetime.now()
+        trabajo_id = await servicio_impresion.encolar_trabajo("reporte", reporte.model_dump())
         
         return ImpresionResponse(
             mensaje="Reporte enviado a impresión",
             id_trabajo=trabajo_id,
-            timestamp=datetime.now()
+            timestamp=ahora
         )
     except Exception as e:
         logger.error(f"Error al imprimir reporte: {e}")
@@ -92,12 +98,10 @@ async def estado_impresion():
     """PATRON MVC - Controller: Endpoint para estado de impresión"""
     try:
         # Obtener estado de la cola
-        cola_length = servicio_impresion.redis_client.llen("cola_impresion")
-        trabajos_recientes = servicio_impresion.redis_client.lrange("cola_impresion", 0, 4)
+        estado = await servicio_impresion.obtener_estado_cola()
         
         return {
-            "trabajos_en_cola": cola_length,
-            "trabajos_recientes": trabajos_recientes,
+            **estado,
             "impresora_conectada": True
         }
     except Exception as e:
@@ -106,4 +110,11 @@ async def estado_impresion():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
@@ -2,12 +2,14 @@
 Modelos de impresión - PATRON MVC Model Layer
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any
 from datetime import datetime
 
 class ItemTicket(BaseModel):
     """PATRON COMPOSITE: Item como parte del ticket"""
+    model_config = ConfigDict(frozen=True)
+    
     nombre: str
     cantidad: int
     precio_unitario: float
@@ -15,6 +17,8 @@ class ItemTicket(BaseModel):
 
 class TicketRequest(BaseModel):
     """PATRON COMMAND: Representa un comando de impresión"""
+    model_config = ConfigDict(frozen=True)
+    
     id_venta: str = Field(..., description="ID de la venta")
     productos: List[ItemTicket] = Field(..., description="Productos del ticket")
     total: float = Field(..., description="Total de la venta")
@@ -24,6 +28,8 @@ class TicketRequest(BaseModel):
 
 class ReporteRequest(BaseModel):
     """PATRON COMMAND: Comando para imprimir reporte"""
+    model_config = ConfigDict(frozen=True)
+    
     tipo: str = Field(..., description="Tipo de reporte")
     fecha_inicio: datetime = Field(..., description="Fecha inicio")
     fecha_fin: datetime = Field(..., description="Fecha fin")
@@ -31,6 +37,8 @@ class ReporteRequest(BaseModel):
 
 class ImpresionResponse(BaseModel):
     """Response de impresión"""
+    model_config = ConfigDict(frozen=True)
+    
     mensaje: str
     id_trabajo: str
     timestamp: datetime
\ No newline at end of file
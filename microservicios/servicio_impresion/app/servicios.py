@@ -2,82 +2,194 @@
 Servicios de impresión - PATRON COMMAND para trabajos de impresión
 """
 
-import redis
-import json
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+import orjson
 import asyncio
-from datetime import datetime
+import logging
+import sys
+import time
+from typing import List
 from configuracion import configuration
 
+logger = logging.getLogger(__name__)
+
+# Redis Stream de trabajos y grupo de consumidores que los procesa. Clave nueva:
+# la antigua "cola_impresion" era una lista y XADD sobre ella fallaría
+COLA_IMPRESION = "stream_impresion"
+GRUPO_IMPRESORAS = "impresoras"
+# Trabajos entregados y sin confirmar durante este tiempo se reasignan a otro worker
+RECLAMO_INACTIVO_MS = 60_000
+
+# Separadores de impresión, construidos una sola vez
+SEP_TICKET = "=" * 40
+SUBSEP_TICKET = "-" * 40
+SEP_REPORTE = "=" * 50
+SUBSEP_REPORTE = "-" * 50
+# Formato de línea de producto, parseado una sola vez: nombre truncado a 20 caracteres
+_FORMATO_LINEA_TICKET = "{nombre:20.20} {cantidad:3} x ${precio_unitario:6.2f} = ${subtotal:7.2f}".format
+
+def calcular_total(productos: List[dict]) -> float:
+    """Calcula en una sola pasada el total del ticket a partir de cantidad x precio unitario"""
+    return sum(producto['cantidad'] * producto['precio_unitario'] for producto in productos)
+
 class ServicioImpresion:
     """PATRON COMMAND: Maneja comandos de impresión en cola"""
     
     def __init__(self):
-        self.redis_client = redis.Redis.from_url(configuration.REDIS_URL, decode_responses=True)
+        self.redis_client = aioredis.from_url(
+            configuration.REDIS_URL,
+            decode_responses=True,
+            max_connections=20
+        )
+        # PATRON STRATEGY: Estrategia de impresión registrada por tipo de trabajo
+        self._estrategias = {
+            "ticket_venta": self._imprimir_ticket,
+            "reporte": self._imprimir_reporte,
+        }
+    
+    async def inicializar_cola(self):
+        """Crea el stream y el grupo de consumidores si aún no existen"""
+        try:
+            await self.redis_client.xgroup_create(COLA_IMPRESION, GRUPO_IMPRESORAS, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
     
-    def encolar_trabajo(self, tipo: str, datos: dict) -> str:
+    async def encolar_trabajo(self, tipo: str, datos: dict) -> str:
         """COMMAND: Encuela un trabajo de impresión"""
-        trabajo_id = f"impresion_{datetime.now().timestamp()}"
+        # Nanosegundos en hexadecimal: sin colisiones entre trabajos de un mismo milisegundo
+        marca_ns = time.time_ns()
+        trabajo_id = f"impresion_{marca_ns:x}"
         trabajo = {
             "id": trabajo_id,
             "tipo": tipo,
             "datos": datos,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": marca_ns,
             "estado": "pendiente"
         }
         
-        self.redis_client.lpush("cola_impresion", json.dumps(trabajo))
+        # orjson serializa datetime de forma nativa (fechas de tickets y reportes incluidas)
+        await self.redis_client.xadd(COLA_IMPRESION, {"payload": orjson.dumps(trabajo)})
         return trabajo_id
     
     async def procesar_impresion(self, trabajo: dict):
         """COMMAND: Procesa un trabajo de impresión"""
         try:
-            # Simular tiempo de impresión
-            await asyncio.sleep(2)
+            # Simular tiempo de impresión solo si está configurado
+            if configuration.SIMULATE_PRINT_DELAY:
+                await asyncio.sleep(configuration.SIMULATE_PRINT_DELAY)
             
             # PATRON STRATEGY: Diferentes estrategias según el tipo
-            if trabajo["tipo"] == "ticket_venta":
-                await self._imprimir_ticket(trabajo["datos"])
-            elif trabajo["tipo"] == "reporte":
-                await self._imprimir_reporte(trabajo["datos"])
+            estrategia = self._estrategias.get(trabajo["tipo"])
+            if estrategia is not None:
+                await estrategia(trabajo["datos"])
             
-            # Marcar como completado
             trabajo["estado"] = "completado"
-            self.redis_client.lrem("cola_impresion", 1, json.dumps(trabajo))
             
         except Exception as e:
             print(f"Error en impresión: {e}")
             trabajo["estado"] = "error"
             trabajo["error"] = str(e)
     
+    async def _procesar_mensajes(self, mensajes):
+        """Procesa un lote del stream y confirma (XACK) cada mensaje al terminar"""
+        for mensaje_id, campos in mensajes:
+            if campos:
+                await self.procesar_impresion(orjson.loads(campos["payload"]))
+            # Confirmado y eliminado: el stream solo conserva trabajos no terminados
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.xack(COLA_IMPRESION, GRUPO_IMPRESORAS, mensaje_id)
+                pipe.xdel(COLA_IMPRESION, mensaje_id)
+                await pipe.execute()
+    
+    async def consumir(self, consumidor: str):
+        """Worker: lee trabajos del grupo de consumidores hasta ser cancelado"""
+        while True:
+            try:
+                respuesta = await self.redis_client.xreadgroup(
+                    GRUPO_IMPRESORAS, consumidor, {COLA_IMPRESION: ">"}, count=10, block=1000
+                )
+                if respuesta:
+                    for _, mensajes in respuesta:
+                        await self._procesar_mensajes(mensajes)
+                    continue
+                
+                # Sin trabajos nuevos: recuperar los que un worker caído dejó sin confirmar
+                reclamados = await self.redis_client.xautoclaim(
+                    COLA_IMPRESION, GRUPO_IMPRESORAS, consumidor,
+                    min_idle_time=RECLAMO_INACTIVO_MS, start_id="0-0", count=10
+                )
+                await self._procesar_mensajes(reclamados[1])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error leyendo la cola de impresión: {e}")
+                await asyncio.sleep(1)
+    
+    async def obtener_estado_cola(self, limite: int = 5) -> dict:
+        """Trabajos sin terminar, entregados sin confirmar y los más recientes"""
+        # Todo en un único round-trip
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.xlen(COLA_IMPRESION)
+            pipe.xpending(COLA_IMPRESION, GRUPO_IMPRESORAS)
+            pipe.xrevrange(COLA_IMPRESION, count=limite)
+            cola_length, pendientes, recientes = await pipe.execute()
+        return {
+            "trabajos_en_cola": cola_length,
+            "trabajos_en_proceso": pendientes["pending"],
+            "trabajos_recientes": [orjson.loads(campos["payload"]) for _, campos in recientes]
+        }
+    
+    async def cerrar(self):
+        """Libera el pool de conexiones Redis"""
+        await self.redis_client.aclose()
+    
     async def _imprimir_ticket(self, datos: dict):
         """STRATEGY: Imprimir ticket de venta"""
-        print("=" * 40)
-        print("          TICKET DE VENTA")
-        print("=" * 40)
-        print(f"Cliente: {datos.get('cliente', 'N/A')}")
-        print(f"Fecha: {datos.get('fecha', 'N/A')}")
-        print(f"Vendedor: {datos.get('vendedor', 'N/A')}")
-        print("-" * 40)
+        lineas = [
+            SEP_TICKET,
+            "          TICKET DE VENTA",
+            SEP_TICKET,
+            f"Cliente: {datos.get('cliente', 'N/A')}",
+            f"Fecha: {datos.get('fecha', 'N/A')}",
+            f"Vendedor: {datos.get('vendedor', 'N/A')}",
+            SUBSEP_TICKET,
+        ]
+        
+        productos = datos.get('productos', [])
+        total_calculado = calcular_total(productos)
+        if abs(total_calculado - datos.get('total', 0)) > 0.01:
+            logger.warning(
+                f"Ticket {datos.get('id_venta')}: total recibido {datos.get('total', 0):.2f} "
+                f"no coincide con el calculado {total_calculado:.2f}"
+            )
         
-        for producto in datos.get('productos', []):
-            print(f"{producto['nombre'][:20]:20} {producto['cantidad']:3} x ${producto['precio_unitario']:6.2f} = ${producto['subtotal']:7.2f}")
+        lineas.extend(_FORMATO_LINEA_TICKET(**producto) for producto in productos)
         
-        print("-" * 40)
-        print(f"TOTAL: ${datos.get('total', 0):.2f}")
-        print("=" * 40)
-        print("     ¡Gracias por su compra!")
-        print("=" * 40)
+        lineas.extend((
+            SUBSEP_TICKET,
+            f"TOTAL: ${datos.get('total', 0):.2f}",
+            SEP_TICKET,
+            "     ¡Gracias por su compra!",
+            SEP_TICKET,
+        ))
+        # Una sola escritura por ticket en lugar de un print por línea
+        sys.stdout.write("\n".join(lineas) + "\n")
     
     async def _imprimir_reporte(self, datos: dict):
         """STRATEGY: Imprimir reporte"""
-        print("=" * 50)
-        print(f"       REPORTE: {datos.get('tipo', 'N/A').upper()}")
-        print("=" * 50)
-        print(f"Periodo: {datos.get('fecha_inicio', 'N/A')} a {datos.get('fecha_fin', 'N/A')}")
-        print("-" * 50)
+        lineas = [
+            SEP_REPORTE,
+            f"       REPORTE: {datos.get('tipo', 'N/A').upper()}",
+            SEP_REPORTE,
+            f"Periodo: {datos.get('fecha_inicio', 'N/A')} a {datos.get('fecha_fin', 'N/A')}",
+            SUBSEP_REPORTE,
+        ]
         
         # Aquí se imprimirían los datos específicos del reporte
         for key, value in datos.get('datos', {}).items():
-            print(f"{key}: {value}")
+            lineas.append(f"{key}: {value}")
         
-        print("=" * 50)
\ No newline at end of file
+        lineas.append(SEP_REPORTE)
+        sys.stdout.write("\n".join(lineas) + "\n")
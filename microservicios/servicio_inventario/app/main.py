@@ -3,75 +3,236 @@ Servicio de Inventario - POS Core
 ARQUITECTURA MVC + PATRONES GOF
 """
 
-from fastapi import FastAPI, HTTPException, status, Depends
-from pymongo import MongoClient
+from fastapi import FastAPI, HTTPException, status, Depends, Header
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime
-from typing import List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional
 import logging
+import re
+import time
 from configuracion import configuration
-from modelos import Producto, ProductoCrear, ProductoActualizar
+from modelos import Producto, ProductoCrear, ProductoActualizar, MovimientoStock, EstadoDescuento
 from observador import sujeto_stock
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# PATRON SINGLETON: Un único cliente (y su pool) por proceso, creado al importar
+_client = AsyncIOMotorClient(
+    configuration.MONGODB_URL,
+    maxPoolSize=configuration.MONGO_MAX_POOL_SIZE,
+    minPoolSize=configuration.MONGO_MIN_POOL_SIZE
+)
+_collection = _client[configuration.BASE_DATOS][configuration.COLECCION_PRODUCTOS]
+_descuentos = _client[configuration.BASE_DATOS][configuration.COLECCION_DESCUENTOS]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida: comprueba MongoDB una sola vez y cierra el pool al apagar"""
+    try:
+        await _client.admin.command('ping')
+        logger.info("Conexión a MongoDB establecida correctamente")
+        # SKU único; sparse porque servicio_productos guarda documentos sin 'sku' en la misma colección
+        await _collection.create_index("sku", unique=True, sparse=True)
+        await _collection.create_index([("activo", 1), ("categoria", 1)])
+        # Los registros de descuentos caducan solos: solo sirven para reintentos y anulaciones
+        await _descuentos.create_index("fecha", expireAfterSeconds=configuration.DESCUENTOS_TTL)
+    except Exception as e:
+        logger.error(f"Error conectando a MongoDB: {e}")
+        raise
+    yield
+    _client.close()
+
 # PATRON MVC - Controller: FastAPI app como controlador principal
 app = FastAPI(
     title="Servicio de Inventario - POS Core",
     description="Microservicio para gestión de productos e inventario",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Comprime los listados de productos; por debajo de 512 bytes no compensa
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 # PATRON DEPENDENCY INJECTION: Factory para base de datos
 def get_database():
-    """PATRON FACTORY METHOD: Crea conexión a MongoDB"""
-    try:
-        client = MongoClient(configuration.MONGODB_URL)
-        database = client[configuration.BASE_DATOS]
-        collection = database[configuration.COLECCION_PRODUCTOS]
-        client.admin.command('ping')
-        logger.info("Conexión a MongoDB establecida correctamente")
-        return collection
-    except Exception as e:
-        logger.error(f"Error conectando a MongoDB: {e}")
-        raise
+    """PATRON FACTORY METHOD: Entrega la colección compartida, sin reconectar ni hacer ping"""
+    return _collection
+
+# Campos que expone el modelo Producto: el resto del documento no viaja desde MongoDB
+PRODUCTO_PROJECTION = {
+    "nombre": 1, "descripcion": 1, "precio": 1, "categoria": 1, "sku": 1,
+    "stock": 1, "stock_minimo": 1, "fecha_creacion": 1, "fecha_actualizacion": 1, "activo": 1
+}
+
+# Validación rápida de IDs antes de construir el ObjectId
+_OID_RE = re.compile(r'[0-9a-fA-F]{24}')
 
 # PATRON REPOSITORY: Abstracción del acceso a datos
 class ProductoRepository:
     """Repository Pattern: Abstrae las operaciones de base de datos"""
     
-    def __init__(self, database):
+    def __init__(self, database, descuentos):
         self.collection = database
+        self.descuentos = descuentos
     
     async def crear_producto(self, producto_data: dict) -> str:
-        result = self.collection.insert_one(producto_data)
+        result = await self.collection.insert_one(producto_data)
         return str(result.inserted_id)
     
-    async def obtener_producto_por_id(self, producto_id: str) -> Optional[dict]:
-        if not ObjectId.is_valid(producto_id):
+    async def obtener_producto_por_id(self, producto_id: str,
+                                      projection: Optional[dict] = None) -> Optional[dict]:
+        if not _OID_RE.fullmatch(producto_id):
             return None
-        return self.collection.find_one({"_id": ObjectId(producto_id)})
+        return await self.collection.find_one({"_id": ObjectId(producto_id)}, projection)
     
-    async def listar_productos(self, filtro: dict, skip: int = 0, limit: int = 10) -> List[dict]:
-        cursor = self.collection.find(filtro).skip(skip).limit(limit)
-        return list(cursor)
+    async def listar_productos(self, filtro: dict, skip: int = 0, limit: int = 10,
+                               projection: Optional[dict] = None) -> List[dict]:
+        cursor = self.collection.find(filtro, projection).skip(skip).limit(limit)
+        return await cursor.to_list(length=limit)
     
     async def actualizar_producto(self, producto_id: str, datos_actualizacion: dict) -> bool:
-        if not ObjectId.is_valid(producto_id):
+        if not _OID_RE.fullmatch(producto_id):
             return False
         datos_actualizacion["fecha_actualizacion"] = datetime.now()
-        result = self.collection.update_one(
+        result = await self.collection.update_one(
             {"_id": ObjectId(producto_id)},
             {"$set": datos_actualizacion}
         )
         return result.modified_count > 0
     
+    async def actualizar_y_devolver(self, producto_id: str, datos_actualizacion: dict) -> Optional[dict]:
+        """Actualiza y devuelve el documento resultante en un solo round-trip (None si no existe)"""
+        if not _OID_RE.fullmatch(producto_id):
+            return None
+        return await self.collection.find_one_and_update(
+            {"_id": ObjectId(producto_id)},
+            {"$set": {**datos_actualizacion, "fecha_actualizacion": datetime.now()}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def eliminar_y_devolver(self, producto_id: str) -> Optional[dict]:
+        """Borrado lógico en un solo round-trip; devuelve el documento previo (None si no existe)"""
+        if not _OID_RE.fullmatch(producto_id):
+            return None
+        return await self.collection.find_one_and_update(
+            {"_id": ObjectId(producto_id)},
+            {"$set": {"activo": False, "fecha_actualizacion": datetime.now()}},
+            projection={"activo": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+    
+    async def decrementar_stock(self, cantidades: Dict[str, int]) -> Optional[str]:
+        """Descuenta stock de todos los productos o de ninguno; devuelve el ID sin stock (None si se aplicó)"""
+        ahora = datetime.now()
+        aplicados: Dict[str, int] = {}
+        try:
+            for producto_id, cantidad in cantidades.items():
+                # $inc con condición stock >= cantidad: atómico, sin leer antes ni dejar stock negativo.
+                # Uno a uno porque bulk_write no indica cuáles de sus operaciones se aplicaron
+                modificado = _OID_RE.fullmatch(producto_id) and (await self.collection.update_one(
+                    {"_id": ObjectId(producto_id), "activo": True, "stock": {"$gte": cantidad}},
+                    {"$inc": {"stock": -cantidad}, "$set": {"fecha_actualizacion": ahora}}
+                )).modified_count
+                if not modificado:
+                    # Compensación: se devuelve lo ya descontado en esta misma operación
+                    await self.reponer_stock(aplicados)
+                    return producto_id
+                aplicados[producto_id] = cantidad
+        except Exception:
+            # Error de red o del servidor a mitad del lote: tampoco puede quedar descontado a medias
+            await self.reponer_stock(aplicados)
+            raise
+        return None
+    
+    async def reponer_stock(self, cantidades: Dict[str, int]) -> int:
+        """Devuelve unidades al stock en un solo bulk_write; devuelve cuántos productos se repusieron"""
+        ahora = datetime.now()
+        operaciones = [
+            UpdateOne(
+                {"_id": ObjectId(producto_id)},
+                {"$inc": {"stock": cantidad}, "$set": {"fecha_actualizacion": ahora}}
+            )
+            for producto_id, cantidad in cantidades.items()
+            if _OID_RE.fullmatch(producto_id)
+        ]
+        if not operaciones:
+            return 0
+        result = await self.collection.bulk_write(operaciones, ordered=False)
+        return result.modified_count
+    
+    async def registrar_descuento(self, clave: str, cantidades: Dict[str, int]) -> Optional[dict]:
+        """Reserva la clave de un descuento; devuelve el registro previo si la clave ya se usó (None si es nueva)"""
+        try:
+            await self.descuentos.insert_one({
+                "_id": clave,
+                "estado": EstadoDescuento.PENDIENTE.value,
+                "movimientos": [
+                    {"producto_id": producto_id, "cantidad": cantidad}
+                    for producto_id, cantidad in cantidades.items()
+                ],
+                "fecha": datetime.now()
+            })
+            return None
+        except DuplicateKeyError:
+            return await self.descuentos.find_one({"_id": clave})
+    
+    async def cerrar_descuento(self, clave: str, estado: EstadoDescuento, sin_stock: Optional[str] = None) -> bool:
+        """Pasa un descuento pendiente a su estado final; False si entretanto se anuló"""
+        result = await self.descuentos.update_one(
+            {"_id": clave, "estado": EstadoDescuento.PENDIENTE.value},
+            {"$set": {"estado": estado.value, "sin_stock": sin_stock}}
+        )
+        return result.modified_count > 0
+    
+    async def liberar_descuento(self, clave: str):
+        """Borra un descuento pendiente que no llegó a aplicarse, para que la clave pueda reintentarse"""
+        await self.descuentos.delete_one({"_id": clave, "estado": EstadoDescuento.PENDIENTE.value})
+    
+    async def anular_descuento(self, clave: str) -> Optional[dict]:
+        """Marca la clave como anulada; devuelve el registro previo si estaba pendiente o aplicado"""
+        try:
+            # Clave aún no usada: queda anulada y un descuento rezagado con ella ya no se aplica
+            await self.descuentos.insert_one({
+                "_id": clave, "estado": EstadoDescuento.ANULADO.value, "movimientos": [], "fecha": datetime.now()
+            })
+            return None
+        except DuplicateKeyError:
+            return await self.descuentos.find_one_and_update(
+                {"_id": clave, "estado": {"$in": [EstadoDescuento.PENDIENTE.value, EstadoDescuento.APLICADO.value]}},
+                {"$set": {"estado": EstadoDescuento.ANULADO.value}},
+                return_document=ReturnDocument.BEFORE
+            )
+    
+    async def restaurar_descuento(self, clave: str):
+        """Deshace una anulación cuya reposición falló, para que pueda reintentarse"""
+        await self.descuentos.update_one(
+            {"_id": clave, "estado": EstadoDescuento.ANULADO.value},
+            {"$set": {"estado": EstadoDescuento.APLICADO.value}}
+        )
+    
+    async def listar_stock_bajo(self, producto_ids: List[str]) -> List[dict]:
+        """Productos de la lista cuyo stock quedó por debajo del mínimo"""
+        object_ids = [ObjectId(pid) for pid in producto_ids if _OID_RE.fullmatch(pid)]
+        cursor = self.collection.find(
+            {"_id": {"$in": object_ids}, "$expr": {"$lt": ["$stock", "$stock_minimo"]}},
+            {"nombre": 1, "sku": 1, "stock": 1, "stock_minimo": 1}
+        )
+        return await cursor.to_list(length=len(object_ids))
+    
     async def eliminar_producto(self, producto_id: str) -> bool:
-        if not ObjectId.is_valid(producto_id):
+        if not _OID_RE.fullmatch(producto_id):
             return False
-        result = self.collection.update_one(
+        result = await self.collection.update_one(
             {"_id": ObjectId(producto_id)},
             {"$set": {"activo": False, "fecha_actualizacion": datetime.now()}}
         )
@@ -85,31 +246,29 @@ class InventarioService:
         self.repository = repository
     
     async def crear_producto(self, producto: ProductoCrear) -> dict:
-        # Validar que el SKU no exista
-        productos_existentes = await self.repository.listar_productos({"sku": producto.sku})
-        if productos_existentes:
+        producto_data = producto.model_dump()
+        producto_data["stock"] = producto_data.pop("stock_inicial")
+        ahora = datetime.now()
+        producto_data.update(fecha_creacion=ahora, fecha_actualizacion=ahora, activo=True)
+        
+        # SKU único garantizado por el índice: sin consulta previa ni condición de carrera
+        try:
+            await self.repository.crear_producto(producto_data)
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Ya existe un producto con este SKU"
             )
         
-        producto_data = producto.dict()
-        producto_data["stock"] = producto_data.pop("stock_inicial")
-        producto_data["fecha_creacion"] = datetime.now()
-        producto_data["fecha_actualizacion"] = datetime.now()
-        producto_data["activo"] = True
-        
-        # PATRON OBSERVER: Notificar si el stock está bajo
+        # PATRON OBSERVER: Notificar si el stock está bajo (solo si el producto se creó)
         if producto_data["stock"] < producto_data["stock_minimo"]:
-            sujeto_stock.notificar_stock_bajo(producto_data)
-        
-        producto_id = await self.repository.crear_producto(producto_data)
-        producto_creado = await self.repository.obtener_producto_por_id(producto_id)
+            await sujeto_stock.notificar_stock_bajo(producto_data)
         
-        return self._adaptar_producto(producto_creado)
+        # insert_one ya agregó el _id al documento: no hace falta volver a leerlo
+        return self._adaptar_producto(producto_data)
     
     async def obtener_producto(self, producto_id: str) -> dict:
-        producto = await self.repository.obtener_producto_por_id(producto_id)
+        producto = await self.repository.obtener_producto_por_id(producto_id, PRODUCTO_PROJECTION)
         if not producto:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -126,65 +285,109 @@ class InventarioService:
         filtro = {"activo": True}
         if categoria:
             filtro["categoria"] = categoria
-        productos = await self.repository.listar_productos(filtro, skip, limit)
+        productos = await self.repository.listar_productos(filtro, skip, limit, PRODUCTO_PROJECTION)
         return [self._adaptar_producto(prod) for prod in productos]
     
     async def actualizar_producto(self, producto_id: str, producto_actualizar: ProductoActualizar) -> dict:
-        producto = await self.repository.obtener_producto_por_id(producto_id)
-        if not producto:
+        datos_actualizacion = producto_actualizar.model_dump(exclude_unset=True, exclude_none=True)
+        
+        # Un solo round-trip: actualiza y devuelve el documento resultante
+        producto_actualizado = await self.repository.actualizar_y_devolver(producto_id, datos_actualizacion)
+        if not producto_actualizado:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Producto no encontrado"
             )
         
-        datos_actualizacion = {k: v for k, v in producto_actualizar.dict().items() if v is not None}
-        
-        # PATRON OBSERVER: Notificar si el stock queda bajo después de actualizar
+        # PATRON OBSERVER: Notificar si el stock quedó bajo después de actualizar
         if "stock" in datos_actualizacion:
-            stock_minimo = datos_actualizacion.get("stock_minimo", producto.get("stock_minimo", 5))
-            if datos_actualizacion["stock"] < stock_minimo:
-                producto_actualizado = {**producto, **datos_actualizacion}
-                sujeto_stock.notificar_stock_bajo(producto_actualizado)
+            if producto_actualizado["stock"] < producto_actualizado.get("stock_minimo", 5):
+                await sujeto_stock.notificar_stock_bajo(producto_actualizado)
         
-        actualizado = await self.repository.actualizar_producto(producto_id, datos_actualizacion)
-        if not actualizado:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No se pudo actualizar el producto"
-            )
-        
-        producto_actualizado = await self.repository.obtener_producto_por_id(producto_id)
         return self._adaptar_producto(producto_actualizado)
     
     async def eliminar_producto(self, producto_id: str):
-        producto = await self.repository.obtener_producto_por_id(producto_id)
+        # Devuelve el estado previo: distingue "no existe" de "ya estaba eliminado"
+        producto = await self.repository.eliminar_y_devolver(producto_id)
         if not producto:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Producto no encontrado"
             )
-        eliminado = await self.repository.eliminar_producto(producto_id)
-        if not eliminado:
+        if not producto.get("activo", True):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No se pudo eliminar el producto"
             )
     
+    @staticmethod
+    def _sumar_cantidades(movimientos: List[MovimientoStock]) -> Dict[str, int]:
+        """Un producto repetido se mueve una sola vez por el total"""
+        cantidades: Dict[str, int] = {}
+        for movimiento in movimientos:
+            cantidades[movimiento.producto_id] = cantidades.get(movimiento.producto_id, 0) + movimiento.cantidad
+        return cantidades
+    
+    async def decrementar_stock(self, clave: str, decrementos: List[MovimientoStock]) -> dict:
+        cantidades = self._sumar_cantidades(decrementos)
+        
+        # Idempotencia: cada clave (el ID de la venta) se descuenta una sola vez;
+        # un reintento recibe el resultado ya registrado
+        previo = await self.repository.registrar_descuento(clave, cantidades)
+        if previo is not None:
+            if previo["estado"] == EstadoDescuento.APLICADO:
+                return {"aplicado": True, "sin_stock": None}
+            # Rechazado: indica el producto sin stock; pendiente o anulado: sin resultado (None)
+            return {"aplicado": False, "sin_stock": previo.get("sin_stock")}
+        
+        try:
+            sin_stock = await self.repository.decrementar_stock(cantidades)
+        except Exception:
+            # El repositorio ya devolvió lo descontado: la clave queda libre para reintentar
+            await self.repository.liberar_descuento(clave)
+            raise
+        if sin_stock is not None:
+            await self.repository.cerrar_descuento(clave, EstadoDescuento.RECHAZADO, sin_stock)
+            return {"aplicado": False, "sin_stock": sin_stock}
+        if not await self.repository.cerrar_descuento(clave, EstadoDescuento.APLICADO):
+            # La venta anuló la clave mientras se descontaba: se devuelve lo descontado
+            await self.repository.reponer_stock(cantidades)
+            return {"aplicado": False, "sin_stock": None}
+        
+        # PATRON OBSERVER: Notificar los productos que quedaron con stock bajo
+        for producto in await self.repository.listar_stock_bajo(list(cantidades)):
+            await sujeto_stock.notificar_stock_bajo(producto)
+        
+        return {"aplicado": True, "sin_stock": None}
+    
+    async def anular_descuento(self, clave: str) -> dict:
+        """Compensación por clave: repone el stock si el descuento se aplicó y bloquea uno rezagado"""
+        previo = await self.repository.anular_descuento(clave)
+        repuestos = 0
+        # Si estaba pendiente, el propio descuento en curso ve la anulación y repone
+        if previo is not None and previo["estado"] == EstadoDescuento.APLICADO:
+            try:
+                repuestos = await self.repository.reponer_stock({
+                    movimiento["producto_id"]: movimiento["cantidad"] for movimiento in previo["movimientos"]
+                })
+            except Exception:
+                await self.repository.restaurar_descuento(clave)
+                raise
+        return {"anulado": True, "repuestos": repuestos}
+    
     def _adaptar_producto(self, producto_db: dict) -> dict:
         """PATRON ADAPTER: Convierte producto de BD a formato API"""
         if not producto_db:
             return None
-        producto_adaptado = producto_db.copy()
-        producto_adaptado["id"] = str(producto_adaptado["_id"])
-        del producto_adaptado["_id"]
-        return producto_adaptado
+        # En el sitio: Motor entrega un dict nuevo por consulta que nadie más usa
+        producto_db["id"] = str(producto_db.pop("_id"))
+        return producto_db
 
 # PATRON DEPENDENCY INJECTION
+@lru_cache(maxsize=1)
 def get_inventario_service() -> InventarioService:
-    """Inyecta dependencias del servicio de inventario"""
-    database = get_database()
-    repository = ProductoRepository(database)
-    return InventarioService(repository)
+    """Inyecta dependencias del servicio de inventario (una única instancia por proceso)"""
+    return InventarioService(ProductoRepository(get_database(), _descuentos))
 
 # ENDPOINTS - PATRON MVC Controller
 @app.get("/")
@@ -193,24 +396,37 @@ async def raiz():
         "servicio": "Inventario POS Core",
         "estado": "Funcionando",
         "version": "1.0.0",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now()
     }
 
-@app.get("/health")
-async def salud():
+# Último resultado del ping de /health: (instante monotónico, estado)
+_ultimo_ping = (float("-inf"), "")
+
+async def _estado_base_datos() -> str:
+    """Pinguea MongoDB como mucho una vez cada HEALTH_PING_TTL segundos"""
+    global _ultimo_ping
+    instante, estado = _ultimo_ping
+    ahora = time.monotonic()
+    if ahora - instante < configuration.HEALTH_PING_TTL:
+        return estado
     try:
-        client = MongoClient(configuration.MONGODB_URL)
-        client.admin.command('ping')
-        base_datos_status = "Conectado"
+        await _client.admin.command('ping')
+        estado = "Conectado"
     except Exception as e:
-        base_datos_status = f"Error: {str(e)}"
+        estado = f"Error: {str(e)}"
         logger.error(f"Health check falló: {e}")
+    _ultimo_ping = (ahora, estado)
+    return estado
+
+@app.get("/health")
+async def salud():
+    base_datos_status = await _estado_base_datos()
 
     return {
         "estado": "Saludable",
         "servicio": "Inventario",
         "base_datos": base_datos_status,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now()
     }
 
 @app.post("/api/v1/productos", response_model=Producto, status_code=status.HTTP_201_CREATED)
@@ -231,7 +447,7 @@ async def crear_producto(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
-@app.get("/api/v1/productos", response_model=List[Producto])
+@app.get("/api/v1/productos", response_model=None)
 async def listar_productos(
     categoria: Optional[str] = None,
     skip: int = 0,
@@ -241,7 +457,8 @@ async def listar_productos(
     """PATRON MVC - Controller: Endpoint para listar productos"""
     try:
         productos = await inventario_service.listar_productos(categoria, skip, limit)
-        return [Producto(**prod) for prod in productos]
+        # Ya proyectados y adaptados: se serializan tal cual, sin validar de nuevo
+        return productos
     except Exception as e:
         logger.error(f"Error listando productos: {e}")
         raise HTTPException(
@@ -249,7 +466,38 @@ async def listar_productos(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
-@app.get("/api/v1/productos/{producto_id}", response_model=Producto)
+@app.post("/api/v1/productos/decrementar_stock")
+async def decrementar_stock(
+    decrementos: List[MovimientoStock],
+    clave: str = Header(..., alias="Idempotency-Key", min_length=1, max_length=64),
+    inventario_service: InventarioService = Depends(get_inventario_service)
+):
+    """PATRON MVC - Controller: Endpoint para descontar stock de varios productos (todo o nada, una vez por clave)"""
+    try:
+        return await inventario_service.decrementar_stock(clave, decrementos)
+    except Exception as e:
+        logger.error(f"Error decrementando stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.post("/api/v1/productos/anular_descuento")
+async def anular_descuento(
+    clave: str = Header(..., alias="Idempotency-Key", min_length=1, max_length=64),
+    inventario_service: InventarioService = Depends(get_inventario_service)
+):
+    """PATRON MVC - Controller: Endpoint para anular el descuento de una clave (compensación)"""
+    try:
+        return await inventario_service.anular_descuento(clave)
+    except Exception as e:
+        logger.error(f"Error anulando descuento de stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/productos/{producto_id}", response_model=None)
 async def obtener_producto(
     producto_id: str,
     inventario_service: InventarioService = Depends(get_inventario_service)
@@ -257,7 +505,7 @@ async def obtener_producto(
     """PATRON MVC - Controller: Endpoint para obtener producto"""
     try:
         producto = await inventario_service.obtener_producto(producto_id)
-        return Producto(**producto)
+        return producto
     except HTTPException:
         raise
     except Exception as e:
@@ -305,5 +553,13 @@ async def eliminar_producto(
         )
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
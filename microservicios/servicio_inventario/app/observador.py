@@ -4,7 +4,8 @@ PATRON GOF OBSERVER: Para notificaciones desacopladas
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import Dict, Any
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -17,14 +18,14 @@ class Observador(ABC):
     """
     
     @abstractmethod
-    def actualizar(self, evento: str, datos: Dict[str, Any]):
+    async def actualizar(self, evento: str, datos: Dict[str, Any]):
         """Método abstracto para actualizar observadores"""
         pass
 
 class NotificadorEmail(Observador):
     """Observador concreto para notificaciones por email"""
     
-    def actualizar(self, evento: str, datos: Dict[str, Any]):
+    async def actualizar(self, evento: str, datos: Dict[str, Any]):
         try:
             logger.info(f"Notificación Email - Evento: {evento}")
             logger.info(f"Producto: {datos.get('nombre')}, Stock: {datos.get('stock')}")
@@ -34,7 +35,7 @@ class NotificadorEmail(Observador):
 class NotificadorLog(Observador):
     """Observador concreto para registro en logs"""
     
-    def actualizar(self, evento: str, datos: Dict[str, Any]):
+    async def actualizar(self, evento: str, datos: Dict[str, Any]):
         try:
             log_message = f"NOTIFICACION: {evento} | Producto: {datos.get('nombre')} | Stock: {datos.get('stock')}"
             logger.warning(log_message)
@@ -48,32 +49,33 @@ class SujetoStock:
     """
     
     def __init__(self):
-        self._observadores: List[Observador] = []
+        # Dict como conjunto ordenado: altas/bajas O(1) conservando el orden de registro
+        self._observadores: Dict[Observador, None] = {}
     
     def agregar_observador(self, observador: Observador):
         """Agrega un observador a la lista"""
-        if observador not in self._observadores:
-            self._observadores.append(observador)
+        self._observadores.setdefault(observador, None)
     
     def eliminar_observador(self, observador: Observador):
         """Elimina un observador de la lista"""
-        if observador in self._observadores:
-            self._observadores.remove(observador)
+        self._observadores.pop(observador, None)
     
-    def notificar_observadores(self, evento: str, datos: Dict[str, Any]):
+    async def notificar_observadores(self, evento: str, datos: Dict[str, Any]):
         """
         Notifica a todos los observadores registrados
-        PATRON ITERATOR: Itera sobre todos los observadores
+        PATRON ITERATOR: Notifica a todos los observadores de forma concurrente
         """
-        for observador in self._observadores:
-            try:
-                observador.actualizar(evento, datos)
-            except Exception as e:
-                logger.error(f"Error notificando observador: {str(e)}")
+        resultados = await asyncio.gather(
+            *(observador.actualizar(evento, datos) for observador in self._observadores),
+            return_exceptions=True
+        )
+        for resultado in resultados:
+            if isinstance(resultado, Exception):
+                logger.error(f"Error notificando observador: {str(resultado)}")
     
-    def notificar_stock_bajo(self, producto: Dict[str, Any]):
+    async def notificar_stock_bajo(self, producto: Dict[str, Any]):
         """Método específico para notificaciones de stock bajo"""
-        self.notificar_observadores("stock_bajo", producto)
+        await self.notificar_observadores("stock_bajo", producto)
 
 # Instancia global del sujeto - PATRON SINGLETON
 sujeto_stock = SujetoStock()
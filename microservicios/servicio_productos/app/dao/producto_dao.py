@@ -1,16 +1,49 @@
 """
 Data Access Object (DAO) para Productos
-Implementa el patrón DAO para abstraer completamente el acceso a MongoDB
+Implementa el patrón DAO para abstraer completamente el acceso a MongoDB (Motor, asíncrono)
 """
 
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
 from bson import ObjectId
+from cachetools import TTLCache
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import logging
+import re
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Un ObjectId en texto son 24 dígitos hexadecimales: validación precompilada,
+# más barata que ObjectId.is_valid (que intenta construir el ObjectId)
+_OID_RE = re.compile(r'[0-9a-fA-F]{24}')
+
+# Proyección para consultas de listado: solo los campos que expone la API
+PRODUCTO_PROJECTION_LIST = {
+    'nombre': 1, 'descripcion': 1, 'precio': 1, 'categoria': 1,
+    'codigo': 1, 'sku': 1, 'stock': 1, 'stock_minimo': 1, 'activo': 1,
+    'fecha_creacion': 1, 'fecha_actualizacion': 1
+}
+# Etapa $project para listados: MongoDB entrega el id como texto, de modo que los
+# documentos no necesitan _convert_to_dict (las fechas las serializa orjson)
+PRODUCTO_PROJECT_STAGE = {'$project': {
+    **PRODUCTO_PROJECTION_LIST,
+    '_id': 0,
+    'id': {'$toString': '$_id'},
+    'sku': {'$ifNull': ['$sku', '$codigo']}
+}}
+
+# Colación española insensible a mayúsculas/minúsculas (strength 2: sí distingue acentos)
+COLACION_NOMBRE = {'locale': 'es', 'strength': 2}
+
+# Documentos por lote al recorrer cursores sin límite: memoria acotada
+TAMANO_LOTE_CURSOR = 200
+
+# Búsqueda de texto: mismos campos más la relevancia calculada por MongoDB
+PRODUCTO_PROJECTION_BUSQUEDA = {**PRODUCTO_PROJECTION_LIST, 'score': {'$meta': 'textScore'}}
+_ORDEN_RELEVANCIA = [('score', {'$meta': 'textScore'})]
+
 
 class DAOError(Exception):
     """Excepción personalizada para errores del DAO"""
@@ -33,40 +66,51 @@ class ProductoDAO:
         Inicializa el DAO con una conexión a la base de datos
         
         Args:
-            db_connection: Conexión a MongoDB
+            db_connection: Base de datos de Motor (AsyncIOMotorDatabase)
         """
         self.db = db_connection
         self.collection_name = "productos"
+        # Lecturas calientes por id y por código; se invalidan en cada escritura.
+        # Por proceso: otro worker puede servir un dato viejo hasta 60 segundos
+        self._by_id_cache = TTLCache(maxsize=4096, ttl=60)
+        self._by_code_cache = TTLCache(maxsize=4096, ttl=60)
     
     def _get_collection(self):
         """Obtiene la colección de productos de MongoDB"""
         return self.db[self.collection_name]
     
+    def _invalidar_cache(self, producto_id: str, codigo: Optional[str] = None):
+        """Descarta las entradas cacheadas de un producto tras modificarlo"""
+        self._by_id_cache.pop(producto_id, None)
+        if codigo is not None:
+            self._by_code_cache.pop(codigo, None)
+    
     def _convert_to_dict(self, producto_doc):
         """
         Convierte un documento de MongoDB a un diccionario Python
         
+        El documento se modifica en el sitio: cada consulta entrega un dict nuevo
+        que nadie más referencia, así que copiarlo solo añade trabajo. Las fechas
+        se dejan como datetime: orjson las serializa directamente en la respuesta.
+        
         Args:
             producto_doc: Documento de MongoDB
             
         Returns:
-            Diccionario con el ID como string
+            El mismo diccionario con el ID como string
         """
         if not producto_doc:
             return None
         
         # Convertir ObjectId a string
-        producto_dict = dict(producto_doc)
-        producto_dict['id'] = str(producto_dict.pop('_id'))
-        
-        # Convertir fechas a string ISO format
-        for date_field in ['creado_en', 'actualizado_en']:
-            if date_field in producto_dict and isinstance(producto_dict[date_field], datetime):
-                producto_dict[date_field] = producto_dict[date_field].isoformat()
+        producto_doc['id'] = str(producto_doc.pop('_id'))
+        # La API expone como 'sku' el código que se almacena en 'codigo'
+        if 'sku' not in producto_doc and 'codigo' in producto_doc:
+            producto_doc['sku'] = producto_doc['codigo']
         
-        return producto_dict
+        return producto_doc
     
-    def crear(self, producto_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def crear(self, producto_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Crea un nuevo producto en la base de datos
         
@@ -93,24 +137,23 @@ class ProductoDAO:
             if producto_data.get('precio', 0) <= 0:
                 raise ValueError("El precio debe ser mayor a 0")
             
-            # Verificar que el código no exista
-            codigo_existente = collection.find_one({'codigo': producto_data['codigo']})
-            if codigo_existente:
-                raise ValueError(f"El código {producto_data['codigo']} ya existe")
-            
-            # Agregar metadatos
+            # Agregar metadatos: una sola marca de tiempo (UTC) para toda la operación
+            ahora = datetime.now(timezone.utc)
             producto_data['activo'] = True
-            producto_data['creado_en'] = datetime.utcnow()
-            producto_data['actualizado_en'] = datetime.utcnow()
+            producto_data['fecha_creacion'] = ahora
+            producto_data['fecha_actualizacion'] = ahora
             
-            # Insertar en la base de datos
-            result = collection.insert_one(producto_data)
+            # Insertar en la base de datos; el índice único sobre 'codigo' rechaza duplicados
+            try:
+                result = await collection.insert_one(producto_data)
+            except DuplicateKeyError:
+                raise ValueError(f"El código {producto_data['codigo']} ya existe")
             
-            # Obtener el documento insertado
-            producto_insertado = collection.find_one({'_id': result.inserted_id})
+            # El documento insertado ya se conoce: no se vuelve a leer de MongoDB
+            producto_data['_id'] = result.inserted_id
             
             logger.info(f"Producto creado exitosamente: {producto_data['codigo']}")
-            return self._convert_to_dict(producto_insertado)
+            return self._convert_to_dict(producto_data)
             
         except ValueError as ve:
             logger.warning(f"Error de validación al crear producto: {str(ve)}")
@@ -119,7 +162,7 @@ class ProductoDAO:
             logger.error(f"Error DAO al crear producto: {str(e)}")
             raise DAOError(f"No se pudo crear el producto: {str(e)}")
     
-    def obtener_por_id(self, producto_id: str) -> Optional[Dict[str, Any]]:
+    async def obtener_por_id(self, producto_id: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene un producto por su ID
         
@@ -130,21 +173,29 @@ class ProductoDAO:
             Diccionario con los datos del producto o None si no existe
         """
         try:
+            cacheado = self._by_id_cache.get(producto_id)
+            if cacheado is not None:
+                # Copia: el llamador puede modificar el diccionario devuelto
+                return dict(cacheado)
+            
             collection = self._get_collection()
             
             # Validar formato del ID
-            if not ObjectId.is_valid(producto_id):
+            if not _OID_RE.fullmatch(producto_id):
                 raise ValueError("ID de producto inválido")
+            oid = ObjectId(producto_id)
             
             # Buscar el producto
-            producto_doc = collection.find_one({'_id': ObjectId(producto_id)})
+            producto_doc = await collection.find_one({'_id': oid}, PRODUCTO_PROJECTION_LIST)
             
             if not producto_doc:
                 logger.debug(f"Producto no encontrado: {producto_id}")
                 return None
             
             logger.debug(f"Producto encontrado: {producto_id}")
-            return self._convert_to_dict(producto_doc)
+            producto = self._convert_to_dict(producto_doc)
+            self._by_id_cache[producto_id] = producto
+            return dict(producto)
             
         except ValueError as ve:
             logger.warning(f"ID inválido: {str(ve)}")
@@ -153,14 +204,41 @@ class ProductoDAO:
             logger.error(f"Error DAO al obtener producto {producto_id}: {str(e)}")
             raise DAOError(f"No se pudo obtener el producto: {str(e)}")
     
-    def obtener_todos(self, filtros: Optional[Dict] = None, 
-                     pagina: int = 1, por_pagina: int = 10) -> Dict[str, Any]:
+    async def obtener_por_ids(self, producto_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene varios productos en una sola consulta
+        
+        Args:
+            producto_ids: Lista de IDs de producto como string
+            
+        Returns:
+            Diccionario {id: producto}; los IDs inválidos o inexistentes no aparecen
+        """
+        try:
+            collection = self._get_collection()
+            
+            object_ids = [ObjectId(pid) for pid in set(producto_ids) if _OID_RE.fullmatch(pid)]
+            if not object_ids:
+                return {}
+            
+            cursor = collection.find({'_id': {'$in': object_ids}})
+            productos = [self._convert_to_dict(doc) for doc in await cursor.to_list(length=len(object_ids))]
+            
+            logger.debug(f"Obtenidos {len(productos)} de {len(object_ids)} productos solicitados")
+            return {producto['id']: producto for producto in productos}
+            
+        except Exception as e:
+            logger.error(f"Error DAO al obtener productos por IDs: {str(e)}")
+            raise DAOError(f"No se pudo obtener los productos: {str(e)}")
+    
+    async def obtener_todos(self, filtros: Optional[Dict] = None, 
+                     desde_id: Optional[str] = None, por_pagina: int = 10) -> Dict[str, Any]:
         """
-        Obtiene todos los productos con paginación y filtros
+        Obtiene todos los productos con paginación por cursor (keyset sobre _id) y filtros
         
         Args:
             filtros: Diccionario con filtros de búsqueda
-            pagina: Número de página (comienza en 1)
+            desde_id: ID del último producto de la página anterior (None para la primera)
             por_pagina: Cantidad de elementos por página
             
         Returns:
@@ -169,45 +247,50 @@ class ProductoDAO:
         try:
             collection = self._get_collection()
             
-            if filtros is None:
-                filtros = {}
+            filtros = dict(filtros) if filtros else {}
             
             # Filtro por defecto: solo productos activos
             if 'activo' not in filtros:
                 filtros['activo'] = True
             
-            # Calcular skip para paginación
-            skip = (pagina - 1) * por_pagina
+            # Keyset: la página empieza después del último _id entregado, sin recorrer los anteriores
+            consulta = filtros
+            if desde_id is not None:
+                if not _OID_RE.fullmatch(desde_id):
+                    raise ValueError("ID de paginación inválido")
+                consulta = {**filtros, '_id': {'$gt': ObjectId(desde_id)}}
             
-            # Contar total de documentos
-            total = collection.count_documents(filtros)
+            # Obtener documentos paginados, ya convertidos por el servidor
+            cursor = collection.aggregate([
+                {'$match': consulta},
+                {'$sort': {'_id': 1}},
+                {'$limit': por_pagina},
+                PRODUCTO_PROJECT_STAGE
+            ])
+            productos = await cursor.to_list(length=por_pagina)
             
-            # Obtener documentos paginados
-            cursor = collection.find(filtros).skip(skip).limit(por_pagina)
+            # Hay más páginas solo si esta vino completa
+            siguiente = productos[-1]['id'] if len(productos) == por_pagina else None
             
-            # Convertir documentos
-            productos = [self._convert_to_dict(doc) for doc in cursor]
-            
-            # Calcular metadatos de paginación
-            total_paginas = (total + por_pagina - 1) // por_pagina if por_pagina > 0 else 0
-            
-            logger.debug(f"Obtenidos {len(productos)} productos, página {pagina}")
+            logger.debug(f"Obtenidos {len(productos)} productos desde {desde_id}")
             
             return {
                 'productos': productos,
                 'paginacion': {
-                    'pagina_actual': pagina,
-                    'por_pagina': por_pagina,
-                    'total_productos': total,
-                    'total_paginas': total_paginas
+                    'desde_id': desde_id,
+                    'siguiente': siguiente,
+                    'por_pagina': por_pagina
                 }
             }
             
+        except ValueError as ve:
+            logger.warning(f"Error de validación al listar productos: {str(ve)}")
+            raise ve
         except Exception as e:
             logger.error(f"Error DAO al obtener productos: {str(e)}")
             raise DAOError(f"No se pudo obtener los productos: {str(e)}")
     
-    def obtener_por_codigo(self, codigo: str) -> Optional[Dict[str, Any]]:
+    async def obtener_por_codigo(self, codigo: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene un producto por su código único
         
@@ -218,20 +301,29 @@ class ProductoDAO:
             Diccionario con los datos del producto o None
         """
         try:
+            cacheado = self._by_code_cache.get(codigo)
+            if cacheado is not None:
+                return dict(cacheado)
+            
             collection = self._get_collection()
             
-            producto_doc = collection.find_one({
+            producto_doc = await collection.find_one({
                 'codigo': codigo,
                 'activo': True
-            })
+            }, PRODUCTO_PROJECTION_LIST)
             
-            return self._convert_to_dict(producto_doc)
+            if not producto_doc:
+                return None
+            
+            producto = self._convert_to_dict(producto_doc)
+            self._by_code_cache[codigo] = producto
+            return dict(producto)
             
         except Exception as e:
             logger.error(f"Error DAO al buscar producto por código {codigo}: {str(e)}")
             raise DAOError(f"No se pudo buscar el producto: {str(e)}")
     
-    def actualizar(self, producto_id: str, 
+    async def actualizar(self, producto_id: str, 
                   datos_actualizados: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Actualiza un producto existente
@@ -247,8 +339,9 @@ class ProductoDAO:
             collection = self._get_collection()
             
             # Validar ID
-            if not ObjectId.is_valid(producto_id):
+            if not _OID_RE.fullmatch(producto_id):
                 raise ValueError("ID de producto inválido")
+            oid = ObjectId(producto_id)
             
             # No permitir actualización del ID
             if 'id' in datos_actualizados:
@@ -256,29 +349,30 @@ class ProductoDAO:
             if '_id' in datos_actualizados:
                 del datos_actualizados['_id']
             
-            # Si se actualiza el código, verificar que no exista
-            if 'codigo' in datos_actualizados:
-                producto_existente = collection.find_one({
-                    'codigo': datos_actualizados['codigo'],
-                    '_id': {'$ne': ObjectId(producto_id)}
-                })
-                if producto_existente:
-                    raise ValueError(f"El código {datos_actualizados['codigo']} ya está en uso")
-            
             # Agregar timestamp de actualización
-            datos_actualizados['actualizado_en'] = datetime.utcnow()
-            
-            # Realizar la actualización
-            result = collection.find_one_and_update(
-                {'_id': ObjectId(producto_id)},
-                {'$set': datos_actualizados},
-                return_document=True  # Retornar el documento actualizado
-            )
+            datos_actualizados['fecha_actualizacion'] = datetime.now(timezone.utc)
+            
+            # Realizar la actualización; un 'codigo' repetido lo rechaza el índice único
+            try:
+                result = await collection.find_one_and_update(
+                    {'_id': oid},
+                    {'$set': datos_actualizados},
+                    return_document=True  # Retornar el documento actualizado
+                )
+            except DuplicateKeyError:
+                raise ValueError(f"El código {datos_actualizados['codigo']} ya está en uso")
             
             if not result:
                 logger.warning(f"Producto no encontrado para actualizar: {producto_id}")
                 return None
             
+            if 'codigo' in datos_actualizados:
+                # El código anterior ya no se conoce: vaciar el cache por código (operación rara)
+                self._by_id_cache.pop(producto_id, None)
+                self._by_code_cache.clear()
+            else:
+                self._invalidar_cache(producto_id, result.get('codigo'))
+            
             logger.info(f"Producto actualizado: {producto_id}")
             return self._convert_to_dict(result)
             
@@ -289,7 +383,56 @@ class ProductoDAO:
             logger.error(f"Error DAO al actualizar producto {producto_id}: {str(e)}")
             raise DAOError(f"No se pudo actualizar el producto: {str(e)}")
     
-    def eliminar(self, producto_id: str) -> bool:
+    async def bulk_actualizar(self, updates: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Actualiza varios productos con un único bulk_write
+        
+        Args:
+            updates: Lista de tuplas (id del producto, campos a actualizar)
+            
+        Returns:
+            Diccionario con los productos encontrados y modificados
+        """
+        try:
+            collection = self._get_collection()
+            
+            ahora = datetime.now(timezone.utc)
+            operaciones = []
+            for producto_id, datos in updates:
+                if not _OID_RE.fullmatch(producto_id):
+                    raise ValueError(f"ID de producto inválido: {producto_id}")
+                datos = {k: v for k, v in datos.items() if k not in ('id', '_id')}
+                datos['fecha_actualizacion'] = ahora
+                operaciones.append(UpdateOne({'_id': ObjectId(producto_id)}, {'$set': datos}))
+            
+            if not operaciones:
+                return {'encontrados': 0, 'modificados': 0}
+            
+            # Sin orden: un fallo (p. ej. código duplicado) no detiene el resto del lote
+            try:
+                result = await collection.bulk_write(operaciones, ordered=False)
+                resumen = {'encontrados': result.matched_count, 'modificados': result.modified_count}
+            except BulkWriteError as bwe:
+                errores = bwe.details.get('writeErrors', [])
+                raise ValueError(f"{len(errores)} actualizaciones del lote fallaron "
+                                 f"(primer error: {errores[0]['errmsg'] if errores else 'desconocido'})")
+            finally:
+                # Lo ya aplicado debe dejar de servirse desde el cache
+                for producto_id, _ in updates:
+                    self._by_id_cache.pop(producto_id, None)
+                self._by_code_cache.clear()
+            
+            logger.info(f"Actualización en lote: {resumen['modificados']} de {len(operaciones)} productos")
+            return resumen
+            
+        except ValueError as ve:
+            logger.warning(f"Error de validación en actualización en lote: {str(ve)}")
+            raise ve
+        except Exception as e:
+            logger.error(f"Error DAO en actualización en lote: {str(e)}")
+            raise DAOError(f"No se pudo actualizar el lote de productos: {str(e)}")
+    
+    async def eliminar(self, producto_id: str) -> bool:
         """
         Elimina (soft delete) un producto
         
@@ -302,19 +445,23 @@ class ProductoDAO:
         try:
             collection = self._get_collection()
             
-            if not ObjectId.is_valid(producto_id):
+            if not _OID_RE.fullmatch(producto_id):
                 raise ValueError("ID de producto inválido")
+            oid = ObjectId(producto_id)
             
-            # Soft delete: marcar como inactivo
-            result = collection.update_one(
-                {'_id': ObjectId(producto_id)},
+            # Soft delete: marcar como inactivo; se recupera el código para invalidar el cache
+            result = await collection.find_one_and_update(
+                {'_id': oid, 'activo': {'$ne': False}},
                 {'$set': {
                     'activo': False,
-                    'actualizado_en': datetime.utcnow()
-                }}
+                    'fecha_actualizacion': datetime.now(timezone.utc)
+                }},
+                projection={'codigo': 1}
             )
             
-            if result.modified_count > 0:
+            self._invalidar_cache(producto_id, result.get('codigo') if result else None)
+            
+            if result:
                 logger.info(f"Producto eliminado (soft delete): {producto_id}")
                 return True
             else:
@@ -328,7 +475,7 @@ class ProductoDAO:
             logger.error(f"Error DAO al eliminar producto {producto_id}: {str(e)}")
             raise DAOError(f"No se pudo eliminar el producto: {str(e)}")
     
-    def actualizar_stock(self, producto_id: str, cantidad: int) -> Optional[Dict[str, Any]]:
+    async def actualizar_stock(self, producto_id: str, cantidad: int) -> Optional[Dict[str, Any]]:
         """
         Actualiza el stock de un producto (incrementa o decrementa)
         
@@ -342,29 +489,35 @@ class ProductoDAO:
         try:
             collection = self._get_collection()
             
-            if not ObjectId.is_valid(producto_id):
+            if not _OID_RE.fullmatch(producto_id):
                 raise ValueError("ID de producto inválido")
+            oid = ObjectId(producto_id)
+            
+            # Actualización atómica: el filtro garantiza que el stock no quede negativo
+            filtro = {'_id': oid, 'activo': True}
+            if cantidad < 0:
+                filtro['stock'] = {'$gte': -cantidad}
+            
+            result = await collection.find_one_and_update(
+                filtro,
+                {
+                    '$inc': {'stock': cantidad},
+                    '$set': {'fecha_actualizacion': datetime.now(timezone.utc)}
+                },
+                return_document=True
+            )
             
-            # Primero verificar que existe
-            producto = collection.find_one({'_id': ObjectId(producto_id), 'activo': True})
-            if not producto:
-                logger.warning(f"Producto no encontrado para actualizar stock: {producto_id}")
-                return None
-            
-            # Verificar que no quede stock negativo
-            nuevo_stock = producto.get('stock', 0) + cantidad
-            if nuevo_stock < 0:
+            if not result:
+                # Solo en el caso de fallo se distingue "no existe" de "stock insuficiente"
+                existe = await collection.find_one(
+                    {'_id': oid, 'activo': True}, {'_id': 1}
+                )
+                if not existe:
+                    logger.warning(f"Producto no encontrado para actualizar stock: {producto_id}")
+                    return None
                 raise ValueError("Stock no puede ser negativo")
             
-            # Actualizar stock
-            result = collection.find_one_and_update(
-                {'_id': ObjectId(producto_id)},
-                {'$set': {
-                    'stock': nuevo_stock,
-                    'actualizado_en': datetime.utcnow()
-                }},
-                return_document=True
-            )
+            self._invalidar_cache(producto_id, result.get('codigo'))
             
             logger.info(f"Stock actualizado para producto {producto_id}: {cantidad} unidades")
             return self._convert_to_dict(result)
@@ -376,13 +529,12 @@ class ProductoDAO:
             logger.error(f"Error DAO al actualizar stock para producto {producto_id}: {str(e)}")
             raise DAOError(f"No se pudo actualizar el stock: {str(e)}")
     
-    def buscar(self, consulta: str, campo: str = 'nombre') -> List[Dict[str, Any]]:
+    async def buscar(self, consulta: str) -> List[Dict[str, Any]]:
         """
-        Busca productos por texto en un campo específico
+        Busca productos por texto en nombre, descripción y SKU
         
         Args:
             consulta: Texto a buscar
-            campo: Campo donde buscar (nombre, descripcion, etc.)
             
         Returns:
             Lista de productos que coinciden con la búsqueda
@@ -390,31 +542,39 @@ class ProductoDAO:
         try:
             collection = self._get_collection()
             
-            # Crear expresión regular para búsqueda case-insensitive
-            regex = {'$regex': consulta, '$options': 'i'}
-            
+            # Búsqueda sobre el índice de texto (nombre, descripcion, codigo y sku), más relevantes primero
             cursor = collection.find({
-                campo: regex,
+                '$text': {'$search': consulta},
                 'activo': True
-            }).limit(50)  # Limitar resultados
+            }, PRODUCTO_PROJECTION_BUSQUEDA).sort(_ORDEN_RELEVANCIA).limit(50)  # Limitar resultados
+            
+            productos = [self._convert_to_dict(doc) for doc in await cursor.to_list(length=50)]
             
-            productos = [self._convert_to_dict(doc) for doc in cursor]
-            logger.debug(f"Búsqueda '{consulta}' en campo '{campo}': {len(productos)} resultados")
+            if not productos:
+                # $text solo encuentra palabras completas: probar como prefijo del nombre.
+                # Rango sobre el índice colado de 'nombre' en lugar de $regex con 'i'
+                cursor = collection.find({
+                    'nombre': {'$gte': consulta, '$lt': consulta + '\uffff'},
+                    'activo': True
+                }, PRODUCTO_PROJECTION_LIST).collation(COLACION_NOMBRE).limit(50)
+                productos = [self._convert_to_dict(doc) for doc in await cursor.to_list(length=50)]
+            
+            logger.debug(f"Búsqueda '{consulta}': {len(productos)} resultados")
             return productos
             
         except Exception as e:
             logger.error(f"Error DAO al buscar productos: {str(e)}")
             raise DAOError(f"No se pudo realizar la búsqueda: {str(e)}")
     
-    def obtener_productos_bajo_stock(self, limite_stock: int = 10) -> List[Dict[str, Any]]:
+    async def iterar_productos_bajo_stock(self, limite_stock: int = 10) -> AsyncIterator[Dict[str, Any]]:
         """
-        Obtiene productos con stock por debajo del límite especificado
+        Recorre los productos con stock bajo sin cargarlos todos en memoria
         
         Args:
             limite_stock: Límite de stock para alerta
             
-        Returns:
-            Lista de productos con stock bajo
+        Yields:
+            Productos con stock bajo, de menor a mayor stock
         """
         try:
             collection = self._get_collection()
@@ -422,12 +582,25 @@ class ProductoDAO:
             cursor = collection.find({
                 'stock': {'$lt': limite_stock},
                 'activo': True
-            }).sort('stock', 1)  # Ordenar por stock ascendente
+            }, PRODUCTO_PROJECTION_LIST).sort('stock', 1).batch_size(TAMANO_LOTE_CURSOR)  # Ordenar por stock ascendente
             
-            productos = [self._convert_to_dict(doc) for doc in cursor]
-            logger.info(f"Encontrados {len(productos)} productos con stock bajo (<{limite_stock})")
-            return productos
+            async for doc in cursor:
+                yield self._convert_to_dict(doc)
             
         except Exception as e:
             logger.error(f"Error DAO al obtener productos bajo stock: {str(e)}")
-            raise DAOError(f"No se pudo obtener productos bajo stock: {str(e)}")
\ No newline at end of file
+            raise DAOError(f"No se pudo obtener productos bajo stock: {str(e)}")
+    
+    async def obtener_productos_bajo_stock(self, limite_stock: int = 10) -> List[Dict[str, Any]]:
+        """
+        Obtiene productos con stock por debajo del límite especificado
+        
+        Args:
+            limite_stock: Límite de stock para alerta
+            
+        Returns:
+            Lista de productos con stock bajo
+        """
+        productos = [producto async for producto in self.iterar_productos_bajo_stock(limite_stock)]
+        logger.info(f"Encontrados {len(productos)} productos con stock bajo (<{limite_stock})")
+        return productos
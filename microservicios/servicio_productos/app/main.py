@@ -1,89 +1,134 @@
 """
-Servicio de Productos - PATRON MVC + DAO + Repository + Factory + Adapter + Service Layer
+Servicio de Productos - PATRON MVC + DAO + Factory + Adapter + Service Layer
 """
 
 from fastapi import FastAPI, HTTPException, Depends, status, Query
-from pymongo import MongoClient
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
+from functools import lru_cache
+from cachetools import TTLCache
 import logging
+import time
+import orjson
 from configuracion import configuration
-from modelos import Producto, ProductoCrear, ProductoActualizar
-from repositorio import ProductoRepository
-from dao.producto_dao import ProductoDAO, DAOError
+from modelos import Producto, ProductoCrear, ProductoActualizar, ProductoActualizarLote
+from dao.producto_dao import ProductoDAO, DAOError, COLACION_NOMBRE
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Nombre automático del primer índice de texto (nombre + descripcion)
+INDICE_TEXTO_ANTERIOR = "nombre_text_descripcion_text"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida: asegura los índices antes de atender peticiones"""
+    database = get_database()
+    # Un único ping al arrancar; las peticiones usan el pool sin comprobaciones extra
+    await database.client.admin.command("ping")
+    logger.info("Conexión a MongoDB establecida correctamente")
+    productos = database[configuration.COLECCION_PRODUCTOS]
+    # sparse: documentos sin 'codigo' no colisionan entre sí
+    await productos.create_index("codigo", unique=True, sparse=True)
+    # Alertas de stock bajo (igualdad en activo, rango en stock)
+    await productos.create_index([("activo", 1), ("stock", 1)])
+    # Listados por categoría, ya ordenados por _id para la paginación por cursor
+    await productos.create_index([("activo", 1), ("categoria", 1), ("_id", 1)])
+    # Búsqueda de texto en buscar(): solo se permite un índice de texto por colección,
+    # así que el anterior (nombre + descripcion) se reemplaza por el que incluye el SKU
+    if INDICE_TEXTO_ANTERIOR in await productos.index_information():
+        await productos.drop_index(INDICE_TEXTO_ANTERIOR)
+    await productos.create_index(
+        [("nombre", "text"), ("descripcion", "text"), ("codigo", "text"), ("sku", "text")],
+        name="busqueda_texto",
+        default_language="spanish"
+    )
+    # Búsqueda por prefijo de nombre sin distinguir mayúsculas
+    await productos.create_index([("nombre", 1)], collation=COLACION_NOMBRE)
+    yield
+
 # PATRON MVC - Controller principal
 app = FastAPI(
     title="Servicio de Productos - POS Core",
     description="Microservicio para gestión de catálogo de productos con DAO Pattern",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Listados y búsquedas de productos viajan comprimidos;
+# las respuestas pequeñas se envían tal cual
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 # ==============================
 # PATRON FACTORY + DEPENDENCY INJECTION
 # ==============================
 
+@lru_cache(maxsize=1)
 def get_database():
-    """PATRON FACTORY METHOD: Crea conexión a MongoDB"""
+    """PATRON FACTORY METHOD + SINGLETON: Un único cliente Motor (y su pool) por proceso"""
     try:
-        client = MongoClient(configuration.MONGODB_URL)
-        database = client[configuration.BASE_DATOS]
-        client.admin.command('ping')
-        logger.info("Conexión a MongoDB establecida correctamente")
-        return database
+        client = AsyncIOMotorClient(
+            configuration.MONGODB_URL,
+            serverSelectionTimeoutMS=configuration.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            maxPoolSize=configuration.MONGO_MAX_POOL_SIZE,
+            minPoolSize=configuration.MONGO_MIN_POOL_SIZE
+        )
+        return client[configuration.BASE_DATOS]
     except Exception as e:
         logger.error(f"Error conectando a MongoDB: {e}")
         raise
 
-def get_producto_repository():
-    """PATRON FACTORY: Crea instancia del repositorio"""
-    database = get_database()
-    return ProductoRepository(database)
-
+@lru_cache(maxsize=1)
 def get_producto_dao():
-    """PATRON FACTORY: Crea instancia del DAO"""
-    database = get_database()
-    return ProductoDAO(database)
+    """PATRON FACTORY + SINGLETON: Un único DAO por proceso para que su cache sobreviva entre requests"""
+    return ProductoDAO(get_database())
 
 # ==============================
-# PATRON SERVICE LAYER con DAO + Repository
+# PATRON SERVICE LAYER con DAO
 # ==============================
 
 class ProductoService:
     """Service Layer: Contiene la lógica de negocio de productos"""
     
-    def __init__(self, repository: ProductoRepository, dao: ProductoDAO):
-        self.repository = repository
+    # Lecturas de catálogo cacheadas 30s. Cualquier escritura las vacía;
+    # obtener_producto ya se cachea en el DAO y bajo stock se transmite en streaming
+    _cache_listados = TTLCache(maxsize=1024, ttl=30)
+    _cache_busquedas = TTLCache(maxsize=1024, ttl=30)
+    
+    def __init__(self, dao: ProductoDAO):
         self.dao = dao
     
+    @classmethod
+    def _invalidar_lecturas(cls):
+        """Descarta los listados cacheados tras cualquier escritura"""
+        cls._cache_listados.clear()
+        cls._cache_busquedas.clear()
+    
     async def crear_producto(self, producto: ProductoCrear) -> dict:
         """PATRON FACTORY + DAO: Crea nuevo producto con validaciones"""
-        # Validar SKU único usando DAO
-        producto_existente = await self.dao.obtener_por_codigo(producto.sku)
-        if producto_existente:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Ya existe un producto con este SKU"
-            )
-        
-        producto_data = producto.dict()
+        # SKU único: lo garantiza el índice único sobre 'codigo' (el DAO traduce el
+        # DuplicateKeyError a ValueError), sin consulta previa ni condición de carrera
+        producto_data = producto.model_dump()
         producto_data["codigo"] = producto_data.pop("sku")
         producto_data["stock"] = producto_data.pop("stock_inicial", 0)
-        producto_data["fecha_creacion"] = datetime.now()
-        producto_data["fecha_actualizacion"] = datetime.now()
-        producto_data["activo"] = True
+        # activo y las fechas (UTC) los asigna el DAO
         
         # Usar DAO para crear el producto
         try:
             producto_creado = await self.dao.crear(producto_data)
+            self._invalidar_lecturas()
             logger.info(f"Producto creado exitosamente: {producto_data['codigo']}")
-            return self._adaptar_producto(producto_creado)
+            return producto_creado
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         except DAOError as e:
             logger.error(f"Error DAO al crear producto: {e}")
             raise HTTPException(
@@ -105,7 +150,7 @@ class ProductoService:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Producto no disponible"
                 )
-            return self._adaptar_producto(producto)
+            return producto
         except DAOError as e:
             logger.error(f"Error DAO al obtener producto: {e}")
             raise HTTPException(
@@ -113,18 +158,38 @@ class ProductoService:
                 detail=f"Error al obtener producto: {str(e)}"
             )
     
+    async def listar_por_ids(self, producto_ids: List[str]) -> Dict[str, dict]:
+        """Obtiene varios productos en una sola consulta usando DAO ($in)"""
+        try:
+            return await self.dao.obtener_por_ids(producto_ids)
+        except DAOError as e:
+            logger.error(f"Error DAO al obtener productos por IDs: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error al obtener productos: {str(e)}"
+            )
+    
     async def listar_productos(self, categoria: Optional[str] = None, 
-                              skip: int = 0, limit: int = 10) -> List[dict]:
+                              desde_id: Optional[str] = None, limit: int = 10) -> List[dict]:
         """Lista productos con filtros opcionales usando DAO"""
+        clave = (categoria, desde_id, limit)
+        try:
+            return self._cache_listados[clave]
+        except KeyError:
+            pass
+        
         filtro = {"activo": True}
         if categoria:
             filtro["categoria"] = categoria
         
-        # Usar DAO con paginación
+        # Usar DAO con paginación por cursor
         try:
-            resultado = await self.dao.obtener_todos(filtro, skip, limit)
+            resultado = await self.dao.obtener_todos(filtro, desde_id, limit)
             productos = resultado.get("productos", [])
-            return [self._adaptar_producto(prod) for prod in productos]
+            self._cache_listados[clave] = productos
+            return productos
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         except DAOError as e:
             logger.error(f"Error DAO al listar productos: {e}")
             return []
@@ -132,38 +197,23 @@ class ProductoService:
     async def actualizar_producto(self, producto_id: str, 
                                  producto_actualizar: ProductoActualizar) -> dict:
         """Actualiza producto existente usando DAO"""
-        # Verificar que existe
-        producto = await self.dao.obtener_por_id(producto_id)
-        if not producto:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Producto no encontrado"
-            )
-        
         # Preparar datos de actualización
-        datos_actualizacion = {k: v for k, v in producto_actualizar.dict().items() 
-                              if v is not None}
-        
-        # Si se actualiza el SKU, verificar que no exista
-        if 'sku' in datos_actualizacion:
-            producto_existente = await self.dao.obtener_por_codigo(datos_actualizacion['sku'])
-            if producto_existente and str(producto_existente.get('id')) != producto_id:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Ya existe un producto con este SKU"
-                )
-            datos_actualizacion['codigo'] = datos_actualizacion.pop('sku')
+        datos_actualizacion = producto_actualizar.model_dump(exclude_unset=True, exclude_none=True)
         
         try:
-            actualizado = await self.dao.actualizar(producto_id, datos_actualizacion)
-            if not actualizado:
+            # Un solo round-trip: el DAO devuelve el documento ya actualizado
+            # (find_one_and_update) o None si no existe
+            producto_actualizado = await self.dao.actualizar(producto_id, datos_actualizacion)
+            if not producto_actualizado:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="No se pudo actualizar el producto"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Producto no encontrado"
                 )
+            self._invalidar_lecturas()
             
-            producto_actualizado = await self.dao.obtener_por_id(producto_id)
-            return self._adaptar_producto(producto_actualizado)
+            return producto_actualizado
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         except DAOError as e:
             logger.error(f"Error DAO al actualizar producto: {e}")
             raise HTTPException(
@@ -171,22 +221,41 @@ class ProductoService:
                 detail=f"Error al actualizar producto: {str(e)}"
             )
     
-    async def eliminar_producto(self, producto_id: str):
-        """Elimina producto (borrado lógico) usando DAO"""
-        producto = await self.dao.obtener_por_id(producto_id)
-        if not producto:
+    async def actualizar_productos_lote(self, actualizaciones: List[ProductoActualizarLote]) -> Dict[str, int]:
+        """Actualiza varios productos en un solo round-trip usando DAO (bulk_write)"""
+        updates = []
+        for actualizacion in actualizaciones:
+            datos = actualizacion.model_dump(exclude={"id"}, exclude_unset=True, exclude_none=True)
+            if datos:
+                updates.append((actualizacion.id, datos))
+        
+        try:
+            return await self.dao.bulk_actualizar(updates)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except DAOError as e:
+            logger.error(f"Error DAO al actualizar productos en lote: {e}")
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Producto no encontrado"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error al actualizar productos: {str(e)}"
             )
-        
+        finally:
+            # Un lote con errores puede haber aplicado parte de las actualizaciones
+            self._invalidar_lecturas()
+    
+    async def eliminar_producto(self, producto_id: str):
+        """Elimina producto (borrado lógico) usando DAO"""
         try:
+            # False si no existe o ya estaba eliminado: sin consulta previa
             eliminado = await self.dao.eliminar(producto_id)
             if not eliminado:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="No se pudo eliminar el producto"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Producto no encontrado"
                 )
+            self._invalidar_lecturas()
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         except DAOError as e:
             logger.error(f"Error DAO al eliminar producto: {e}")
             raise HTTPException(
@@ -194,20 +263,28 @@ class ProductoService:
                 detail=f"Error al eliminar producto: {str(e)}"
             )
     
-    async def obtener_productos_bajo_stock(self, limite: int = 10) -> List[dict]:
-        """PATRON DAO: Obtiene productos con stock bajo usando DAO"""
+    async def iterar_productos_bajo_stock(self, limite: int = 10) -> AsyncIterator[dict]:
+        """PATRON DAO + ITERATOR: Recorre los productos con stock bajo sin cargarlos todos en memoria"""
         try:
-            productos = await self.dao.obtener_productos_bajo_stock(limite)
-            return [self._adaptar_producto(prod) for prod in productos]
+            async for producto in self.dao.iterar_productos_bajo_stock(limite):
+                yield producto
         except DAOError as e:
+            # Como antes, un error de base de datos termina el listado en lugar de fallar
             logger.error(f"Error DAO al obtener productos bajo stock: {e}")
-            return []
     
     async def buscar_productos(self, consulta: str) -> List[dict]:
         """PATRON DAO: Busca productos por texto usando DAO"""
+        # La búsqueda de texto y el prefijo con colación ignoran mayúsculas
+        clave = consulta.strip().lower()
+        try:
+            return self._cache_busquedas[clave]
+        except KeyError:
+            pass
+        
         try:
-            productos = await self.dao.buscar(consulta, campo="nombre")
-            return [self._adaptar_producto(prod) for prod in productos]
+            productos = await self.dao.buscar(consulta)
+            self._cache_busquedas[clave] = productos
+            return productos
         except DAOError as e:
             logger.error(f"Error DAO al buscar productos: {e}")
             return []
@@ -216,12 +293,13 @@ class ProductoService:
         """Actualiza stock usando DAO"""
         try:
             producto_actualizado = await self.dao.actualizar_stock(producto_id, cantidad)
+            self._invalidar_lecturas()
             if not producto_actualizado:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Producto no encontrado"
                 )
-            return self._adaptar_producto(producto_actualizado)
+            return producto_actualizado
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except DAOError as e:
@@ -230,67 +308,112 @@ class ProductoService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error al actualizar stock: {str(e)}"
             )
-    
-    def _adaptar_producto(self, producto_db: dict) -> dict:
-        """PATRON ADAPTER: Convierte producto de BD a formato API"""
-        if not producto_db:
-            return None
-        producto_adaptado = producto_db.copy()
-        # El DAO ya convierte _id a id, pero asegurar
-        if '_id' in producto_adaptado:
-            producto_adaptado['id'] = str(producto_adaptado['_id'])
-            del producto_adaptado['_id']
-        elif 'id' not in producto_adaptado:
-            producto_adaptado['id'] = producto_db.get('_id')
-        return producto_adaptado
 
+@lru_cache(maxsize=1)
 def get_producto_service() -> ProductoService:
-    """PATRON DEPENDENCY INJECTION: Proporciona instancia del servicio con DAO"""
-    repository = get_producto_repository()
-    dao = get_producto_dao()
-    return ProductoService(repository, dao)
+    """PATRON DEPENDENCY INJECTION + SINGLETON: Una única instancia del servicio con DAO por proceso"""
+    return ProductoService(get_producto_dao())
 
 # ==============================
 # PATRON MVC - Endpoints Controller
 # ==============================
 
+# Respuestas constantes serializadas una sola vez al importar
+_RAIZ_BYTES = orjson.dumps({
+    "servicio": "Productos POS Core",
+    "estado": "Funcionando",
+    "version": "2.0.0",
+    "patrones": ["MVC", "DAO", "Factory", "Adapter", "Service Layer", "Dependency Injection"],
+    "descripcion": "Microservicio de productos con DAO Pattern implementado",
+    "endpoints": {
+        "productos": "/api/v1/productos",
+        "producto_especifico": "/api/v1/productos/{id}",
+        "bajo_stock": "/api/v1/productos/inventario/bajo-stock",
+        "buscar": "/api/v1/productos/buscar/{consulta}",
+        "actualizar_stock": "/api/v1/productos/{id}/stock"
+    }
+})
+
+# Catálogo de patrones: no cambia durante la vida del proceso
+_PATRONES_BYTES = orjson.dumps({
+    "servicio": "Productos",
+    "patrones_implementados": [
+        {
+            "nombre": "DAO Pattern",
+            "ubicacion": "app/dao/producto_dao.py",
+            "descripcion": "Data Access Object para abstraer operaciones de base de datos",
+            "beneficios": ["Separación de responsabilidades", "Facilita testing", "Permite cambiar fuente de datos"]
+        },
+        {
+            "nombre": "MVC Pattern",
+            "ubicacion": "main.py (Controller)",
+            "descripcion": "Model-View-Controller para separar lógica de presentación",
+            "beneficios": ["Organización clara", "Mantenibilidad", "Separación de concerns"]
+        },
+        {
+            "nombre": "Factory Pattern",
+            "ubicacion": "main.py (funciones get_*)",
+            "descripcion": "Creación de instancias de servicios y DAOs",
+            "beneficios": ["Centralización", "Flexibilidad", "Control de instancias"]
+        },
+        {
+            "nombre": "Adapter Pattern",
+            "ubicacion": "ProductoDAO._convert_to_dict()",
+            "descripcion": "Adapta datos de MongoDB a formato de API",
+            "beneficios": ["Compatibilidad", "Separación", "Mantenibilidad"]
+        },
+        {
+            "nombre": "Service Layer Pattern",
+            "ubicacion": "ProductoService class",
+            "descripcion": "Capa de servicio para lógica de negocio",
+            "beneficios": ["Reusabilidad", "Testabilidad", "Separación"]
+        },
+        {
+            "nombre": "Dependency Injection",
+            "ubicacion": "FastAPI Depends()",
+            "descripcion": "Inyección de dependencias para desacoplamiento",
+            "beneficios": ["Testabilidad", "Flexibilidad", "Mantenibilidad"]
+        }
+    ]
+})
+
 @app.get("/")
 async def raiz():
-    return {
-        "servicio": "Productos POS Core",
-        "estado": "Funcionando",
-        "version": "2.0.0",
-        "patrones": ["MVC", "DAO", "Repository", "Factory", "Adapter", "Service Layer", "Dependency Injection"],
-        "descripcion": "Microservicio de productos con DAO Pattern implementado",
-        "endpoints": {
-            "productos": "/api/v1/productos",
-            "producto_especifico": "/api/v1/productos/{id}",
-            "bajo_stock": "/api/v1/productos/inventario/bajo-stock",
-            "buscar": "/api/v1/productos/buscar/{consulta}",
-            "actualizar_stock": "/api/v1/productos/{id}/stock"
-        }
-    }
+    return Response(content=_RAIZ_BYTES, media_type="application/json")
 
-@app.get("/health")
-async def salud():
+# Último resultado del ping de /health: (instante monotónico, estado)
+_ultimo_ping = (float("-inf"), "")
+
+async def _estado_base_datos() -> str:
+    """Pinguea MongoDB como mucho una vez cada HEALTH_PING_TTL segundos"""
+    global _ultimo_ping
+    instante, estado = _ultimo_ping
+    ahora = time.monotonic()
+    if ahora - instante < configuration.HEALTH_PING_TTL:
+        return estado
     try:
-        client = MongoClient(configuration.MONGODB_URL)
-        client.admin.command('ping')
-        base_datos_status = "Conectado"
+        await get_database().client.admin.command('ping')
+        estado = "Conectado"
     except Exception as e:
-        base_datos_status = f"Error: {str(e)}"
+        estado = f"Error: {str(e)}"
         logger.error(f"Health check falló: {e}")
+    _ultimo_ping = (ahora, estado)
+    return estado
+
+@app.get("/health")
+async def salud():
+    base_datos_status = await _estado_base_datos()
 
     return {
         "estado": "Saludable",
         "servicio": "Productos",
         "base_datos": base_datos_status,
-        "timestamp": datetime.now().isoformat(),
-        "patrones_activos": ["DAO", "Repository", "Service Layer", "Factory", "Adapter"],
+        "timestamp": datetime.now(),
+        "patrones_activos": ["DAO", "Service Layer", "Factory", "Adapter"],
         "dao_operaciones": [
             "crear", "obtener_por_id", "obtener_todos", "actualizar",
-            "eliminar", "obtener_por_codigo", "obtener_productos_bajo_stock",
-            "buscar", "actualizar_stock"
+            "eliminar", "obtener_por_codigo", "iterar_productos_bajo_stock",
+            "buscar", "actualizar_stock", "bulk_actualizar"
         ]
     }
 
@@ -302,7 +425,7 @@ async def crear_producto(
     """PATRON MVC - Controller: Endpoint para crear producto usando DAO"""
     try:
         producto_creado = await producto_service.crear_producto(producto)
-        return Producto(**producto_creado)
+        return Producto.model_construct(**producto_creado)
     except HTTPException:
         raise
     except Exception as e:
@@ -312,17 +435,20 @@ async def crear_producto(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
-@app.get("/api/v1/productos", response_model=List[Producto])
+@app.get("/api/v1/productos", response_model=None)
 async def listar_productos(
     categoria: Optional[str] = Query(None),
-    skip: int = Query(0, ge=0),
+    desde_id: Optional[str] = Query(None, description="ID del último producto de la página anterior"),
     limit: int = Query(10, ge=1, le=100),
     producto_service: ProductoService = Depends(get_producto_service)
 ):
     """PATRON MVC - Controller: Endpoint para listar productos usando DAO"""
     try:
-        productos = await producto_service.listar_productos(categoria, skip, limit)
-        return [Producto(**prod) for prod in productos]
+        productos = await producto_service.listar_productos(categoria, desde_id, limit)
+        # Dicts del DAO ya proyectados: se serializan tal cual, sin pasar por Pydantic
+        return productos
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listando productos: {e}")
         raise HTTPException(
@@ -330,7 +456,7 @@ async def listar_productos(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
-@app.get("/api/v1/productos/{producto_id}", response_model=Producto)
+@app.get("/api/v1/productos/{producto_id}", response_model=None)
 async def obtener_producto(
     producto_id: str,
     producto_service: ProductoService = Depends(get_producto_service)
@@ -338,7 +464,7 @@ async def obtener_producto(
     """PATRON MVC - Controller: Endpoint para obtener producto usando DAO"""
     try:
         producto = await producto_service.obtener_producto(producto_id)
-        return Producto(**producto)
+        return producto
     except HTTPException:
         raise
     except Exception as e:
@@ -359,7 +485,7 @@ async def actualizar_producto(
         producto_actualizado = await producto_service.actualizar_producto(
             producto_id, producto_actualizar
         )
-        return Producto(**producto_actualizado)
+        return Producto.model_construct(**producto_actualizado)
     except HTTPException:
         raise
     except Exception as e:
@@ -369,6 +495,28 @@ async def actualizar_producto(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.post("/api/v1/productos/bulk")
+async def actualizar_productos_lote(
+    actualizaciones: List[ProductoActualizarLote],
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """PATRON MVC - Controller: Endpoint para actualizar varios productos en lote"""
+    try:
+        resumen = await producto_service.actualizar_productos_lote(actualizaciones)
+        return {
+            "mensaje": "Actualización en lote completada",
+            **resumen,
+            "timestamp": datetime.now()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error actualizando productos en lote: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
 @app.delete("/api/v1/productos/{producto_id}")
 async def eliminar_producto(
     producto_id: str,
@@ -387,21 +535,28 @@ async def eliminar_producto(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
-@app.get("/api/v1/productos/inventario/bajo-stock")
+async def _stream_bajo_stock(productos: AsyncIterator[dict], limite: int):
+    """Emite el JSON por partes: cada producto se envía en cuanto llega del cursor"""
+    yield b'{"limite":%d,"timestamp":%b,"productos":[' % (limite, orjson.dumps(datetime.now()))
+    total = 0
+    async for producto in productos:
+        yield (b',' if total else b'') + orjson.dumps(producto)
+        total += 1
+    # total y alerta solo se conocen al final del recorrido
+    yield b'],"total":%d,"alerta":%b}' % (total, b'true' if total else b'false')
+
+@app.get("/api/v1/productos/inventario/bajo-stock", response_model=None)
 async def obtener_bajo_stock(
     limite: int = Query(10, ge=1, description="Límite de stock para alerta"),
     producto_service: ProductoService = Depends(get_producto_service)
 ):
     """Endpoint para obtener productos con stock bajo (DAO Pattern)"""
     try:
-        productos = await producto_service.obtener_productos_bajo_stock(limite)
-        return {
-            "productos": [Producto(**prod) for prod in productos],
-            "total": len(productos),
-            "limite": limite,
-            "alerta": len(productos) > 0,
-            "timestamp": datetime.now().isoformat()
-        }
+        # Sin límite de resultados: se transmite en lugar de armar toda la lista en memoria
+        return StreamingResponse(
+            _stream_bajo_stock(producto_service.iterar_productos_bajo_stock(limite), limite),
+            media_type="application/json"
+        )
     except Exception as e:
         logger.error(f"Error obteniendo productos bajo stock: {e}")
         raise HTTPException(
@@ -418,10 +573,10 @@ async def buscar_productos(
     try:
         productos = await producto_service.buscar_productos(consulta)
         return {
-            "productos": [Producto(**prod) for prod in productos],
+            "productos": [Producto.model_construct(**prod) for prod in productos],
             "total": len(productos),
             "consulta": consulta,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()
         }
     except Exception as e:
         logger.error(f"Error buscando productos: {e}")
@@ -441,8 +596,8 @@ async def actualizar_stock(
         producto_actualizado = await producto_service.actualizar_stock(producto_id, cantidad)
         return {
             "mensaje": f"Stock actualizado: {cantidad} unidades",
-            "producto": Producto(**producto_actualizado),
-            "timestamp": datetime.now().isoformat()
+            "producto": Producto.model_construct(**producto_actualizado),
+            "timestamp": datetime.now()
         }
     except HTTPException:
         raise
@@ -456,54 +611,16 @@ async def actualizar_stock(
 @app.get("/api/v1/patrones")
 async def listar_patrones():
     """Endpoint para listar patrones implementados en este servicio"""
-    return {
-        "servicio": "Productos",
-        "patrones_implementados": [
-            {
-                "nombre": "DAO Pattern",
-                "ubicacion": "app/dao/producto_dao.py",
-                "descripcion": "Data Access Object para abstraer operaciones de base de datos",
-                "beneficios": ["Separación de responsabilidades", "Facilita testing", "Permite cambiar fuente de datos"]
-            },
-            {
-                "nombre": "MVC Pattern",
-                "ubicacion": "main.py (Controller)",
-                "descripcion": "Model-View-Controller para separar lógica de presentación",
-                "beneficios": ["Organización clara", "Mantenibilidad", "Separación de concerns"]
-            },
-            {
-                "nombre": "Repository Pattern",
-                "ubicacion": "app/repositorio.py",
-                "descripcion": "Abstracción para acceso a datos de productos",
-                "beneficios": ["Encapsulamiento", "Reusabilidad", "Consistencia"]
-            },
-            {
-                "nombre": "Factory Pattern",
-                "ubicacion": "main.py (funciones get_*)",
-                "descripcion": "Creación de instancias de servicios y repositorios",
-                "beneficios": ["Centralización", "Flexibilidad", "Control de instancias"]
-            },
-            {
-                "nombre": "Adapter Pattern",
-                "ubicacion": "ProductoService._adaptar_producto()",
-                "descripcion": "Adapta datos de MongoDB a formato de API",
-                "beneficios": ["Compatibilidad", "Separación", "Mantenibilidad"]
-            },
-            {
-                "nombre": "Service Layer Pattern",
-                "ubicacion": "ProductoService class",
-                "descripcion": "Capa de servicio para lógica de negocio",
-                "beneficios": ["Reusabilidad", "Testabilidad", "Separación"]
-            },
-            {
-                "nombre": "Dependency Injection",
-                "ubicacion": "FastAPI Depends()",
-                "descripcion": "Inyección de dependencias para desacoplamiento",
-                "beneficios": ["Testabilidad", "Flexibilidad", "Mantenibilidad"]
-            }
-        ]
-    }
+    return Response(content=_PATRONES_BYTES, media_type="application/json")
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
@@ -2,7 +2,7 @@
 Modelos Pydantic para productos - PATRON MVC Model Layer
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -18,6 +18,9 @@ class CategoriaProducto(str, Enum):
 
 class ProductoBase(BaseModel):
     """Modelo base para productos - PATRON BASE MODEL"""
+    # categoria se guarda como su valor (str): coincide con lo que llega de MongoDB
+    model_config = ConfigDict(use_enum_values=True)
+    
     nombre: str = Field(..., min_length=1, max_length=100)
     descripcion: str = Field(..., min_length=1, max_length=500)
     precio: float = Field(..., gt=0)
@@ -31,6 +34,8 @@ class ProductoCrear(ProductoBase):
 
 class ProductoActualizar(BaseModel):
     """PATRON BUILDER: Permite actualización parcial de productos"""
+    model_config = ConfigDict(use_enum_values=True)
+    
     nombre: Optional[str] = Field(None, min_length=1, max_length=100)
     descripcion: Optional[str] = Field(None, min_length=1, max_length=500)
     precio: Optional[float] = Field(None, gt=0)
@@ -38,8 +43,15 @@ class ProductoActualizar(BaseModel):
     stock: Optional[int] = Field(None, ge=0)
     stock_minimo: Optional[int] = Field(None, ge=0)
 
+class ProductoActualizarLote(ProductoActualizar):
+    """PATRON BUILDER: Actualización parcial de un producto dentro de un lote"""
+    id: str
+
 class Producto(ProductoBase):
     """Modelo completo de producto - PATRON DOMAIN MODEL"""
+    # Se construye con model_construct desde datos de MongoDB ya confiables (sin validar)
+    model_config = ConfigDict(from_attributes=True)
+    
     id: str
     stock: int
     stock_minimo: int
@@ -3,25 +3,43 @@ Servicio de Reportes - PATRON MVC + GOF
 """
 
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import List
+from functools import lru_cache
+import asyncio
 import logging
 from configuracion import configuration
 from modelos import ReporteVentas, ReporteInventario, ReporteGeneral
-from servicios import ReporteService
+from servicios import ReporteService, mongo_client, redis_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida: asegura los índices que usan los reportes antes de atender peticiones"""
+    # Todos los reportes de ventas filtran por estado y rango de fecha_creacion
+    await mongo_client[configuration.BASE_DATOS]["ventas"].create_index([("estado", 1), ("fecha_creacion", -1)])
+    yield
+    await redis_client.aclose()
+    mongo_client.close()
+
 # PATRON MVC - Controller principal
 app = FastAPI(
     title="Servicio de Reportes - POS Core",
     description="Microservicio para generación de reportes",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson (C) serializa las series por día y los listados de los reportes
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # PATRON DEPENDENCY INJECTION
+@lru_cache(maxsize=1)
 def get_reporte_service():
+    """Una única instancia por proceso: el servicio no guarda estado por request"""
     return ReporteService()
 
 @app.get("/")
@@ -78,9 +96,11 @@ async def obtener_reporte_general(
         fecha_fin = datetime.now()
         fecha_inicio = fecha_fin - timedelta(days=dias)
         
-        # PATRON COMPOSITE: Reporte general compuesto de otros reportes
-        reporte_ventas = await reporte_service.generar_reporte_ventas(fecha_inicio, fecha_fin)
-        reporte_inventario = await reporte_service.generar_reporte_inventario()
+        # PATRON COMPOSITE: Reporte general compuesto de otros reportes, generados en paralelo
+        reporte_ventas, reporte_inventario = await asyncio.gather(
+            reporte_service.generar_reporte_ventas(fecha_inicio, fecha_fin),
+            reporte_service.generar_reporte_inventario()
+        )
         
         return ReporteGeneral(
             ventas=reporte_ventas,
@@ -92,5 +112,13 @@ async def obtener_reporte_general(
         raise HTTPException(status_code=500, detail="Error generando reporte")
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
@@ -2,108 +2,197 @@
 Servicio de reportes - PATRON STRATEGY para diferentes tipos de reportes
 """
 
-from pymongo import MongoClient
-from datetime import datetime, timedelta
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, time, timedelta
+import asyncio
+import heapq
+import logging
+from operator import itemgetter
 from configuracion import configuration
 from modelos import ReporteVentas, ReporteInventario
 
+logger = logging.getLogger(__name__)
+
+# Claves del cache de reportes; servicio_ventas las borra al registrar una venta.
+# Reportes de ventas: un hash con un campo por periodo (redondeado al minuto)
+CACHE_REPORTES_VENTAS = "rpt:ventas"
+CACHE_REPORTE_INVENTARIO = "rpt:inventario"
+
+# Rollup que mantiene servicio_ventas: un documento por día,
+# {_id: "YYYY-MM-DD", total, cantidad, productos: {producto_id: {nombre, cantidad, total}}}
+COLECCION_VENTAS_DIARIAS = "ventas_diarias"
+
+# PATRON SINGLETON: Un único pool de conexiones Redis por proceso
+redis_client = aioredis.from_url(configuration.REDIS_URL, max_connections=20)
+
+# PATRON SINGLETON: Un único cliente Motor por proceso, compartido por todos los ReporteService
+mongo_client = AsyncIOMotorClient(configuration.MONGODB_URL, maxPoolSize=configuration.MONGO_MAX_POOL_SIZE)
+
 class ReporteService:
     """PATRON STRATEGY: Diferentes estrategias para generar reportes"""
     
     def __init__(self):
-        self.client = MongoClient(configuration.MONGODB_URL)
-        self.db = self.client[configuration.BASE_DATOS]
+        self.db = mongo_client[configuration.BASE_DATOS]
     
     async def generar_reporte_ventas(self, fecha_inicio: datetime, fecha_fin: datetime) -> ReporteVentas:
-        """STRATEGY: Genera reporte de ventas"""
+        """STRATEGY: Genera reporte de ventas (cacheado en Redis)"""
+        # El fin del periodo suele ser "ahora": al minuto, las peticiones cercanas comparten entrada
+        campo = f"{fecha_inicio:%Y%m%d%H%M}:{fecha_fin:%Y%m%d%H%M}"
+        try:
+            cacheado = await redis_client.hget(CACHE_REPORTES_VENTAS, campo)
+            if cacheado is not None:
+                return ReporteVentas.model_validate_json(cacheado)
+        except RedisError as e:
+            logger.warning(f"Cache de reportes no disponible: {e}")
+        
+        reporte = await self._calcular_reporte_ventas(fecha_inicio, fecha_fin)
+        
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(CACHE_REPORTES_VENTAS, campo, reporte.model_dump_json())
+                # El hash entero caduca: TTL desde el primer periodo cacheado
+                pipe.expire(CACHE_REPORTES_VENTAS, configuration.REPORTE_CACHE_TTL, nx=True)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"No se pudo cachear el reporte de ventas: {e}")
+        return reporte
+    
+    async def _calcular_reporte_ventas(self, fecha_inicio: datetime, fecha_fin: datetime) -> ReporteVentas:
+        """Calcula el reporte de ventas en MongoDB"""
         ventas_collection = self.db["ventas"]
         
-        # Ventas en el período
-        ventas = list(ventas_collection.find({
-            "fecha_creacion": {
-                "$gte": fecha_inicio,
-                "$lte": fecha_fin
-            },
-            "estado": "completada"
-        }))
+        # El primer y el último día del periodo están incompletos: se agrupan desde las ventas
+        # del periodo exacto. Los días intermedios, completos, salen del rollup diario, que ya
+        # trae sus totales por producto. Solo se recorren las ventas de los dos días de borde
+        fin_primer_dia = datetime.combine(fecha_inicio.date() + timedelta(days=1), time.min)
+        inicio_ultimo_dia = datetime.combine(fecha_fin.date(), time.min)
         
-        total_ventas = sum(venta["total"] for venta in ventas)
-        cantidad_ventas = len(ventas)
+        # PATRON AGGREGATE: días de borde y sus productos en una sola consulta; en paralelo,
+        # los días intermedios se leen del rollup (un documento por día, no por venta)
+        consulta_bordes = ventas_collection.aggregate([
+            {"$match": {
+                "estado": "completada",
+                "fecha_creacion": {"$gte": fecha_inicio, "$lte": fecha_fin},
+                "$or": [
+                    {"fecha_creacion": {"$lt": fin_primer_dia}},
+                    {"fecha_creacion": {"$gte": inicio_ultimo_dia}}
+                ]
+            }},
+            {"$facet": {
+                "dias": [
+                    {"$group": {
+                        "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$fecha_creacion"}},
+                        "total": {"$sum": "$total"},
+                        "cantidad": {"$sum": 1}
+                    }}
+                ],
+                "productos": [
+                    {"$unwind": "$items"},
+                    {"$group": {
+                        "_id": "$items.producto_id",
+                        "nombre": {"$first": "$items.nombre"},
+                        "cantidad": {"$sum": "$items.cantidad"},
+                        "total": {"$sum": "$items.subtotal"}
+                    }}
+                ]
+            }}
+        ]).to_list(length=1)
+        consulta_dias = self.db[COLECCION_VENTAS_DIARIAS].find({
+            "_id": {"$gt": fecha_inicio.strftime("%Y-%m-%d"), "$lt": fecha_fin.strftime("%Y-%m-%d")}
+        }).to_list(length=None)
+        # $facet siempre devuelve exactamente un documento
+        (bordes,), por_dia = await asyncio.gather(consulta_bordes, consulta_dias)
         
-        # Ventas por día - PATRON ITERATOR
+        # Productos más vendidos: los de los bordes más los del rollup de cada día intermedio
+        productos = {producto["_id"]: producto for producto in bordes["productos"]}
+        for dia in por_dia:
+            for producto_id, vendido in dia.get("productos", {}).items():
+                acumulado = productos.setdefault(
+                    producto_id, {"nombre": vendido["nombre"], "cantidad": 0, "total": 0}
+                )
+                acumulado["cantidad"] += vendido["cantidad"]
+                acumulado["total"] += vendido["total"]
+        mas_vendidos = [
+            {"nombre": producto["nombre"], "cantidad": producto["cantidad"], "total": producto["total"]}
+            for producto in heapq.nlargest(10, productos.values(), key=itemgetter("cantidad"))
+        ]
+        
+        # Ventas por día - PATRON ITERATOR: los días sin ventas se completan con ceros
+        dias = {dia["_id"]: dia for dia in (*por_dia, *bordes["dias"])}
         ventas_por_dia = []
-        current_date = fecha_inicio
-        while current_date <= fecha_fin:
-            next_date = current_date + timedelta(days=1)
-            ventas_dia = list(ventas_collection.find({
-                "fecha_creacion": {
-                    "$gte": current_date,
-                    "$lt": next_date
-                },
-                "estado": "completada"
-            }))
-            
-            total_dia = sum(venta["total"] for venta in ventas_dia)
+        fecha = fecha_inicio.date()
+        while fecha <= fecha_fin.date():
+            clave = fecha.strftime("%Y-%m-%d")
+            dia = dias.get(clave)
             ventas_por_dia.append({
-                "fecha": current_date.strftime("%Y-%m-%d"),
-                "total": total_dia,
-                "cantidad": len(ventas_dia)
+                "fecha": clave,
+                "total": dia["total"] if dia else 0,
+                "cantidad": dia["cantidad"] if dia else 0
             })
-            
-            current_date = next_date
-        
-        # Productos más vendidos - PATRON AGGREGATE
-        productos_vendidos = {}
-        for venta in ventas:
-            for item in venta["items"]:
-                producto_id = item["producto_id"]
-                if producto_id not in productos_vendidos:
-                    productos_vendidos[producto_id] = {
-                        "nombre": item["nombre"],
-                        "cantidad": 0,
-                        "total": 0
-                    }
-                productos_vendidos[producto_id]["cantidad"] += item["cantidad"]
-                productos_vendidos[producto_id]["total"] += item["subtotal"]
-        
-        productos_mas_vendidos = sorted(
-            productos_vendidos.values(),
-            key=lambda x: x["cantidad"],
-            reverse=True
-        )[:10]
+            fecha += timedelta(days=1)
         
         return ReporteVentas(
-            total_ventas=total_ventas,
-            cantidad_ventas=cantidad_ventas,
+            total_ventas=sum(dia["total"] for dia in ventas_por_dia),
+            cantidad_ventas=sum(dia["cantidad"] for dia in ventas_por_dia),
             ventas_por_dia=ventas_por_dia,
-            productos_mas_vendidos=productos_mas_vendidos
+            productos_mas_vendidos=mas_vendidos
         )
     
     async def generar_reporte_inventario(self) -> ReporteInventario:
-        """STRATEGY: Genera reporte de inventario"""
-        productos_collection = self.db["productos"]
+        """STRATEGY: Genera reporte de inventario (cacheado en Redis)"""
+        try:
+            cacheado = await redis_client.get(CACHE_REPORTE_INVENTARIO)
+            if cacheado is not None:
+                return ReporteInventario.model_validate_json(cacheado)
+        except RedisError as e:
+            logger.warning(f"Cache de reportes no disponible: {e}")
         
-        productos = list(productos_collection.find({"activo": True}))
-        total_productos = len(productos)
+        reporte = await self._calcular_reporte_inventario()
+        
+        try:
+            await redis_client.setex(
+                CACHE_REPORTE_INVENTARIO, configuration.REPORTE_CACHE_TTL, reporte.model_dump_json()
+            )
+        except RedisError as e:
+            logger.warning(f"No se pudo cachear el reporte de inventario: {e}")
+        return reporte
+    
+    async def _calcular_reporte_inventario(self) -> ReporteInventario:
+        """Calcula el reporte de inventario en MongoDB"""
+        productos_collection = self.db["productos"]
         
-        productos_stock_bajo = []
-        valor_inventario_total = 0
+        # PATRON AGGREGATE: conteo, valorización y stock bajo en una sola consulta
+        stock_minimo = {"$ifNull": ["$stock_minimo", 5]}
+        resultado, = await productos_collection.aggregate([
+            {"$match": {"activo": True}},
+            {"$facet": {
+                "totales": [
+                    {"$group": {
+                        "_id": None,
+                        "cantidad": {"$sum": 1},
+                        "valor": {"$sum": {"$multiply": ["$precio", "$stock"]}}
+                    }}
+                ],
+                "stock_bajo": [
+                    {"$match": {"$expr": {"$lt": ["$stock", stock_minimo]}}},
+                    {"$project": {
+                        "_id": 0,
+                        "nombre": "$nombre",
+                        "sku": "$sku",
+                        "stock_actual": "$stock",
+                        "stock_minimo": stock_minimo,
+                        "precio": "$precio"
+                    }}
+                ]
+            }}
+        ]).to_list(length=1)
         
-        for producto in productos:
-            valor_producto = producto["precio"] * producto["stock"]
-            valor_inventario_total += valor_producto
-            
-            if producto["stock"] < producto.get("stock_minimo", 5):
-                productos_stock_bajo.append({
-                    "nombre": producto["nombre"],
-                    "sku": producto["sku"],
-                    "stock_actual": producto["stock"],
-                    "stock_minimo": producto.get("stock_minimo", 5),
-                    "precio": producto["precio"]
-                })
+        totales = resultado["totales"][0] if resultado["totales"] else {"cantidad": 0, "valor": 0}
         
         return ReporteInventario(
-            total_productos=total_productos,
-            productos_stock_bajo=productos_stock_bajo,
-            valor_inventario_total=valor_inventario_total
+            total_productos=totales["cantidad"],
+            productos_stock_bajo=resultado["stock_bajo"],
+            valor_inventario_total=totales["valor"]
         )
\ No newline at end of file
@@ -2,32 +2,67 @@
 Servicio de Ventas - PATRON MVC + GOF
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status, Header
-from pymongo import MongoClient
+from fastapi import FastAPI, HTTPException, Depends, status, Header, Query
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
+from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
 import logging
 from configuracion import configuration
-from modelos import VentaCrear, Venta, VentaResponse, EstadoVenta
-from servicios import ProductoService, InventarioService
-from repositorio import VentaRepository
-from dao.producto_dao import ProductoDAO
+from modelos import VentaCrear, VentaImportar, Venta, VentaResponse, EstadoVenta
+from servicios import InventarioService, CacheReportes, http_client, redis_client
+from repositorio import VentaRepository, dia_utc
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# PATRON SINGLETON: Un único cliente Motor (y su pool) por proceso, creado al importar
+_client = AsyncIOMotorClient(configuration.MONGODB_URL, maxPoolSize=configuration.MONGO_MAX_POOL_SIZE)
+_db = _client[configuration.BASE_DATOS]
+
+async def reparar_rollup_periodicamente(repo: VentaRepository):
+    """Recalcula el rollup de ayer y hoy: corrige los incrementos que no llegaron a aplicarse"""
+    while True:
+        await asyncio.sleep(configuration.INTERVALO_REPARACION_DIARIAS)
+        # Misma referencia de fecha que crear_venta (datetime.now() sin zona)
+        ahora = datetime.now()
+        try:
+            # Una venta registrada durante la pasada puede quedar fuera; la siguiente la incluye
+            await repo.reconstruir_diarias([dia_utc(ahora - timedelta(days=1)), dia_utc(ahora)])
+        except Exception as e:
+            logger.error(f"No se pudo reparar el rollup diario: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida: asegura los índices de ventas y el rollup diario antes de atender peticiones"""
+    ventas = _db[configuration.COLECCION_VENTAS]
+    # Reportes: igualdad en estado + rango de fechas
+    await ventas.create_index([("estado", 1), ("fecha_creacion", -1)])
+    # Rollup diario: en cada arranque se recalcula entero desde las ventas (idempotente)
+    # y después, periódicamente, los días recientes
+    repo = VentaRepository(_db)
+    await repo.reconstruir_diarias()
+    reparacion = asyncio.create_task(reparar_rollup_periodicamente(repo))
+    yield
+    reparacion.cancel()
+    await asyncio.gather(http_client.aclose(), redis_client.aclose())
+    _client.close()
+
 # PATRON MVC - Controller principal
 app = FastAPI(
     title="Servicio de Ventas - POS Core",
     description="Microservicio para gestión de ventas",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # PATRON DEPENDENCY INJECTION
 def get_database():
-    client = MongoClient(configuration.MONGODB_URL)
-    return client[configuration.BASE_DATOS]
+    """PATRON FACTORY METHOD: Entrega la base de datos compartida, sin reconectar"""
+    return _db
 
 def get_venta_repository():
     db = get_database()
@@ -64,56 +99,95 @@ async def crear_venta(
     """PATRON MVC - Controller: Endpoint para crear venta"""
     token = obtener_token_autorizacion(authorization)
     
-    # Validar productos y stock - PATRON FACADE: interfaz simple para validación compleja
+    # Cantidad total por producto: un producto repetido en varios items se
+    # descuenta una sola vez por el total
+    cantidades: Dict[str, int] = {}
+    nombres: Dict[str, str] = {}
     for item in venta.items:
-        producto = await ProductoService.obtener_producto(item.producto_id, token)
-        if not producto:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Producto {item.producto_id} no encontrado"
-            )
-        
-        if producto["stock"] < item.cantidad:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Stock insuficiente para {producto['nombre']}"
-            )
+        cantidades[item.producto_id] = cantidades.get(item.producto_id, 0) + item.cantidad
+        nombres[item.producto_id] = item.nombre
+    
+    # El ID de la venta se genera antes de descontar: es la clave de idempotencia del descuento
+    venta_id = ObjectId()
+    clave = str(venta_id)
+    
+    # Validar y descontar stock - PATRON ADAPTER: un único descuento condicional en inventario,
+    # todo o nada, sin lectura previa (no hay ventana entre comprobar y descontar)
+    descuento = await InventarioService.decrementar_stock(cantidades, clave, token)
+    if descuento is None or (not descuento["aplicado"] and descuento["sin_stock"] is None):
+        # Resultado desconocido: se anula por clave, lo que repone el stock si llegó a descontarse
+        if not await InventarioService.anular_descuento(clave, token):
+            logger.error(f"No se pudo anular el descuento de stock de la venta {clave}")
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio de inventario no disponible"
+        )
+    if not descuento["aplicado"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Stock insuficiente o producto no disponible: {nombres[descuento['sin_stock']]}"
+        )
     
     # PATRON FACTORY: Crear venta
-    venta_data = venta.dict()
+    venta_data = venta.model_dump()
+    venta_data["_id"] = venta_id
     venta_data["fecha_creacion"] = datetime.now()
     venta_data["vendedor"] = "Sistema"  # En producción, obtener del token
     venta_data["estado"] = EstadoVenta.COMPLETADA
     
-    venta_id = await repo.crear(venta_data)
-    venta_creada = await repo.obtener_por_id(venta_id)
-    
-    # Actualizar inventario - PATRON ADAPTER: comunicación con otros servicios
-    for item in venta.items:
-        success = await InventarioService.actualizar_stock(
-            item.producto_id, 
-            item.cantidad, 
-            token
-        )
-        if not success:
-            logger.warning(f"No se pudo actualizar stock para producto {item.producto_id}")
+    try:
+        venta_creada = await repo.crear(venta_data)
+    except Exception:
+        # Solo falla si la inserción falló (el rollup diario no propaga errores):
+        # la venta no quedó registrada y se devuelve el stock ya descontado
+        if not await InventarioService.anular_descuento(clave, token):
+            logger.error(f"No se pudo reponer el stock de la venta fallida {clave}: {cantidades}")
+        raise
+    # Los reportes de ventas e inventario ya no reflejan el estado actual
+    await CacheReportes.invalidar()
     
     return VentaResponse(
-        venta=Venta(**venta_creada),
+        venta=venta_creada,
         mensaje="Venta procesada exitosamente"
     )
 
-@app.get("/api/v1/ventas", response_model=List[Venta])
+@app.post("/api/v1/ventas/importar", status_code=status.HTTP_201_CREATED)
+async def importar_ventas(
+    ventas: List[VentaImportar],
+    repo: VentaRepository = Depends(get_venta_repository)
+):
+    """PATRON MVC - Controller: Endpoint para importar ventas ya registradas en lote"""
+    if not ventas:
+        raise HTTPException(status_code=400, detail="No hay ventas para importar")
+    
+    # Ventas históricas: no se valida ni se descuenta stock, solo se registran
+    insertadas, fallidas = await repo.crear_muchas([venta.model_dump() for venta in ventas])
+    if insertadas:
+        await CacheReportes.invalidar()
+    
+    return {
+        "mensaje": "Importación completada",
+        "insertadas": insertadas,
+        "fallidas": fallidas
+    }
+
+# Lecturas: los documentos ya tienen la forma de Venta (los escribe este servicio), así que
+# se serializan directamente con orjson; response_model=None evita revalidarlos y
+# responses= mantiene el esquema en la documentación
+@app.get("/api/v1/ventas", response_model=None, responses={200: {"model": List[Venta]}})
 async def listar_ventas(
-    skip: int = 0,
-    limit: int = 10,
+    desde_id: Optional[str] = Query(None, description="ID de la última venta de la página anterior"),
+    limit: int = Query(10, ge=1, le=100),
     repo: VentaRepository = Depends(get_venta_repository)
 ):
     """PATRON MVC - Controller: Endpoint para listar ventas"""
-    ventas = await repo.listar_todas(skip, limit)
-    return [Venta(**venta) for venta in ventas]
+    try:
+        ventas = await repo.listar_todas(desde_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(ventas)
 
-@app.get("/api/v1/ventas/{venta_id}", response_model=Venta)
+@app.get("/api/v1/ventas/{venta_id}", response_model=None, responses={200: {"model": Venta}})
 async def obtener_venta(
     venta_id: str,
     repo: VentaRepository = Depends(get_venta_repository)
@@ -122,8 +196,16 @@ async def obtener_venta(
     venta = await repo.obtener_por_id(venta_id)
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
-    return Venta(**venta)
+    return ORJSONResponse(venta)
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
\ No newline at end of file
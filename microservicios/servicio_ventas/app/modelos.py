@@ -31,6 +31,12 @@ class VentaCrear(VentaBase):
     """PATRON FACTORY METHOD: Para creación de ventas"""
     pass
 
+class VentaImportar(VentaBase):
+    """Venta ya registrada en otro sistema (importación o reproducción offline)"""
+    fecha_creacion: datetime = Field(..., description="Fecha original de la venta")
+    vendedor: str = Field("Sistema", description="Nombre del vendedor")
+    estado: EstadoVenta = Field(EstadoVenta.COMPLETADA, description="Estado de la venta")
+
 class Venta(VentaBase):
     """Modelo completo de venta - PATRON DOMAIN MODEL"""
     id: str = Field(..., description="ID único de la venta")
@@ -2,28 +2,172 @@
 Repositorio de ventas - PATRON REPOSITORY
 """
 
-from pymongo import MongoClient
+import logging
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from typing import Dict, Iterable, List, Optional, Tuple
 from configuracion import configuration
+from modelos import EstadoVenta
+
+logger = logging.getLogger(__name__)
+
+def dia_utc(fecha: datetime) -> str:
+    """Clave del rollup diario: el día en UTC, igual que $dateToString en reconstruir_diarias"""
+    if fecha.tzinfo is not None:
+        # MongoDB guarda las fechas con zona convertidas a UTC; las naive ya se guardan tal cual
+        fecha = fecha.astimezone(timezone.utc)
+    return fecha.strftime("%Y-%m-%d")
+
+def acumular_rollup(rollup: Dict[str, dict], venta_data: dict):
+    """Suma una venta completada a la actualización del rollup de su día (totales y por producto)"""
+    dia = rollup.setdefault(dia_utc(venta_data["fecha_creacion"]), {
+        "$inc": {"total": 0, "cantidad": 0}, "$set": {}
+    })
+    incrementos = dia["$inc"]
+    incrementos["total"] += venta_data["total"]
+    incrementos["cantidad"] += 1
+    # Un producto repetido en varios items se acumula en una sola ruta ($inc no admite rutas repetidas)
+    for item in venta_data["items"]:
+        producto = f"productos.{item['producto_id']}"
+        incrementos[f"{producto}.cantidad"] = incrementos.get(f"{producto}.cantidad", 0) + item["cantidad"]
+        incrementos[f"{producto}.total"] = incrementos.get(f"{producto}.total", 0) + item["subtotal"]
+        dia["$set"][f"{producto}.nombre"] = item["nombre"]
+
+def adaptar_venta(venta_db: dict) -> dict:
+    """PATRON ADAPTER: Documento de MongoDB con la forma de Venta, sin construir ni revalidar modelos"""
+    venta_db["id"] = str(venta_db.pop("_id"))
+    return venta_db
 
 class VentaRepository:
-    """Repository Pattern: Abstrae operaciones de ventas en MongoDB"""
+    """Repository Pattern: Abstrae operaciones de ventas en MongoDB (Motor, no bloquea el event loop)"""
     
     def __init__(self, database):
         self.collection = database[configuration.COLECCION_VENTAS]
+        self.diarias = database[configuration.COLECCION_VENTAS_DIARIAS]
+        # Importaciones: acuse del primario sin esperar al journal (la fuente puede reenviarse)
+        self.collection_importacion = self.collection.with_options(
+            write_concern=WriteConcern(w=1, j=False)
+        )
+    
+    async def _aplicar_rollup(self, rollup: Dict[str, dict]):
+        """Aplica las actualizaciones acumuladas: una operación por día, no por venta"""
+        if rollup:
+            await self.diarias.bulk_write([
+                UpdateOne({"_id": dia}, actualizacion, upsert=True)
+                for dia, actualizacion in rollup.items()
+            ], ordered=False)
+    
+    async def crear(self, venta_data: dict) -> dict:
+        # insert_one agrega el _id al documento: no hace falta volver a leerlo
+        await self.collection.insert_one(venta_data)
+        if venta_data["estado"] == EstadoVenta.COMPLETADA:
+            # Rollup incremental: los reportes leen un documento por día en vez de cada venta.
+            # La venta ya quedó registrada: un fallo aquí solo se registra y lo corrige la
+            # reparación periódica de los días recientes (ver lifespan en main.py)
+            rollup: Dict[str, dict] = {}
+            acumular_rollup(rollup, venta_data)
+            try:
+                await self._aplicar_rollup(rollup)
+            except Exception as e:
+                logger.error(f"No se pudo actualizar el rollup diario de la venta {venta_data['_id']}: {e}")
+        return adaptar_venta(venta_data)
+    
+    async def crear_muchas(self, ventas_data: List[dict]) -> Tuple[int, int]:
+        """Inserta un lote de ventas con insert_many sin orden; devuelve (insertadas, fallidas)"""
+        completadas = [
+            (indice, venta_data) for indice, venta_data in enumerate(ventas_data)
+            if venta_data["estado"] == EstadoVenta.COMPLETADA
+        ]
+        fallidas = set()
+        try:
+            await self.collection_importacion.insert_many(ventas_data, ordered=False)
+        except BulkWriteError as e:
+            # Sin orden, el resto del lote se inserta igual: solo se excluyen las que fallaron
+            fallidas = {error["index"] for error in e.details["writeErrors"]}
+        except Exception:
+            # No se sabe qué parte del lote quedó insertada: sus días se recalculan desde las ventas
+            await self._reparar_dias({dia_utc(venta_data["fecha_creacion"]) for _, venta_data in completadas})
+            raise
+        
+        # Rollup diario de las completadas insertadas
+        rollup: Dict[str, dict] = {}
+        for indice, venta_data in completadas:
+            if indice not in fallidas:
+                acumular_rollup(rollup, venta_data)
+        try:
+            await self._aplicar_rollup(rollup)
+        except Exception as e:
+            # Las ventas ya están registradas: el rollup de sus días se recalcula desde ellas
+            logger.error(f"No se pudo actualizar el rollup diario de la importación: {e}")
+            await self._reparar_dias(rollup.keys())
+        
+        return len(ventas_data) - len(fallidas), len(fallidas)
+    
+    async def _reparar_dias(self, dias: Iterable[str]):
+        """Reconstruye el rollup de los días dados; si falla, lo corrige la reconstrucción del próximo arranque"""
+        try:
+            await self.reconstruir_diarias(dias)
+        except Exception as e:
+            logger.error(f"No se pudo reconstruir el rollup diario de {sorted(dias)}: {e}")
     
-    async def crear(self, venta_data: dict) -> str:
-        result = self.collection.insert_one(venta_data)
-        return str(result.inserted_id)
+    async def reconstruir_diarias(self, dias: Optional[Iterable[str]] = None):
+        """Recalcula el rollup diario desde las ventas completadas (idempotente); sin dias, todos"""
+        filtro = {"estado": EstadoVenta.COMPLETADA.value}
+        if dias is not None:
+            inicios = [datetime.strptime(dia, "%Y-%m-%d") for dia in dias]
+            if not inicios:
+                return
+            filtro["$or"] = [
+                {"fecha_creacion": {"$gte": inicio, "$lt": inicio + timedelta(days=1)}}
+                for inicio in inicios
+            ]
+        await self.collection.aggregate([
+            {"$match": filtro},
+            # Cada venta aporta su total y su cantidad una sola vez: en su primer item
+            {"$unwind": {"path": "$items", "includeArrayIndex": "posicion"}},
+            {"$group": {
+                "_id": {
+                    "dia": {"$dateToString": {"format": "%Y-%m-%d", "date": "$fecha_creacion"}},
+                    "producto": "$items.producto_id"
+                },
+                "nombre": {"$last": "$items.nombre"},
+                "unidades": {"$sum": "$items.cantidad"},
+                "subtotal": {"$sum": "$items.subtotal"},
+                "total": {"$sum": {"$cond": [{"$eq": ["$posicion", 0]}, "$total", 0]}},
+                "cantidad": {"$sum": {"$cond": [{"$eq": ["$posicion", 0]}, 1, 0]}}
+            }},
+            {"$group": {
+                "_id": "$_id.dia",
+                "total": {"$sum": "$total"},
+                "cantidad": {"$sum": "$cantidad"},
+                "productos": {"$push": {
+                    "k": "$_id.producto",
+                    "v": {"nombre": "$nombre", "cantidad": "$unidades", "total": "$subtotal"}
+                }}
+            }},
+            {"$project": {"total": 1, "cantidad": 1, "productos": {"$arrayToObject": "$productos"}}},
+            {"$merge": {"into": configuration.COLECCION_VENTAS_DIARIAS, "whenMatched": "replace"}}
+        ]).to_list(length=None)
     
-    async def obtener_por_id(self, venta_id: str):
+    async def obtener_por_id(self, venta_id: str) -> Optional[dict]:
         if not ObjectId.is_valid(venta_id):
             return None
-        return self.collection.find_one({"_id": ObjectId(venta_id)})
+        venta = await self.collection.find_one({"_id": ObjectId(venta_id)})
+        return adaptar_venta(venta) if venta else None
     
-    async def listar_todas(self, skip: int = 0, limit: int = 10):
-        cursor = self.collection.find().sort("fecha_creacion", -1).skip(skip).limit(limit)
-        return list(cursor)
+    async def listar_todas(self, desde_id: Optional[str] = None, limit: int = 10) -> List[dict]:
+        # Keyset sobre _id (índice por defecto, creciente en el tiempo): más recientes primero,
+        # cada página empieza tras la última venta entregada sin recorrer las anteriores
+        filtro = {}
+        if desde_id is not None:
+            if not ObjectId.is_valid(desde_id):
+                raise ValueError("ID de paginación inválido")
+            filtro["_id"] = {"$lt": ObjectId(desde_id)}
+        cursor = self.collection.find(filtro).sort("_id", -1).limit(limit)
+        return [adaptar_venta(venta) for venta in await cursor.to_list(length=limit)]
     
     async def obtener_por_fecha(self, fecha_inicio, fecha_fin):
         cursor = self.collection.find({
@@ -32,4 +176,4 @@ class VentaRepository:
                 "$lte": fecha_fin
             }
         })
-        return list(cursor)
\ No newline at end of file
+        return await cursor.to_list(length=None)
\ No newline at end of file
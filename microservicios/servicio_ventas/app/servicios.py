@@ -3,58 +3,99 @@ Servicios externos - PATRON ADAPTER para comunicación entre microservicios
 """
 
 import httpx
+import orjson
+import logging
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException
 from configuracion import configuration
 
-class ProductoService:
-    """PATRON ADAPTER: Adapta comunicación con servicio de productos"""
+logger = logging.getLogger(__name__)
+
+# Claves del cache de servicio_reportes que dejan de ser válidas con cada venta
+CACHE_REPORTES = ("rpt:ventas", "rpt:inventario")
+
+# PATRON SINGLETON: Un único pool de conexiones Redis por proceso
+redis_client = aioredis.from_url(configuration.REDIS_URL, max_connections=10)
+
+# PATRON SINGLETON: Un único cliente HTTP por proceso; reutiliza conexiones keep-alive.
+# HTTP/2 donde el servidor lo negocie (como en el gateway); httpx ya pide gzip por defecto
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=50, max_connections=200)
+)
+
+# URL del servicio de inventario, calculada una sola vez
+URL_INVENTARIO = f"{configuration.INVENTORY_SERVICE_URL}/api/v1/productos"
+
+# Envíos del descuento de stock ante errores de transporte (con la misma clave, sin riesgo de duplicar)
+INTENTOS_DESCUENTO = 2
+
+@lru_cache(maxsize=1024)
+def cabeceras_autorizacion(token: Optional[str]) -> Tuple[Tuple[str, str], ...]:
+    """Cabecera Bearer inmutable y cacheada por token"""
+    if token:
+        return (("Authorization", f"Bearer {token}"),)
+    return ()
+
+class InventarioService:
+    """PATRON ADAPTER: Adapta comunicación con servicio de inventario"""
     
     @staticmethod
-    async def obtener_producto(producto_id: str, token: str = None):
-        headers = {}
-        if token:
-            headers["Authorization"] = f"Bearer {token}"
-        
-        async with httpx.AsyncClient() as client:
+    def _movimientos(cantidades: Dict[str, int]) -> List[dict]:
+        return [
+            {"producto_id": producto_id, "cantidad": cantidad}
+            for producto_id, cantidad in cantidades.items()
+        ]
+    
+    @staticmethod
+    async def decrementar_stock(cantidades: Dict[str, int], clave: str, token: str = None) -> Optional[dict]:
+        """Descuenta el stock de todos los productos o de ninguno en una sola petición.
+        La clave (ID de la venta) hace el descuento idempotente: si la respuesta no llega se
+        reintenta con la misma clave y el inventario devuelve el resultado ya registrado.
+        Devuelve {"aplicado", "sin_stock"} o None si el inventario no respondió"""
+        cabeceras = (*cabeceras_autorizacion(token), ("Idempotency-Key", clave))
+        for intento in range(1, INTENTOS_DESCUENTO + 1):
             try:
-                response = await client.get(
-                    f"{configuration.PRODUCT_SERVICE_URL}/api/v1/productos/{producto_id}",
-                    headers=headers,
-                    timeout=30.0
+                response = await http_client.post(
+                    f"{URL_INVENTARIO}/decrementar_stock",
+                    headers=cabeceras,
+                    json=InventarioService._movimientos(cantidades)
                 )
                 if response.status_code == 200:
-                    return response.json()
-                else:
-                    return None
+                    return orjson.loads(response.content)
+                return None
+            except httpx.TransportError as e:
+                logger.warning(f"Sin respuesta al descontar stock de la venta {clave} (intento {intento}): {e}")
             except Exception as e:
-                print(f"Error obteniendo producto: {e}")
+                logger.error(f"Error actualizando stock: {e}")
                 return None
+        return None
+    
+    @staticmethod
+    async def anular_descuento(clave: str, token: str = None) -> bool:
+        """Compensación por clave: repone lo descontado para la venta (si se llegó a descontar)
+        y evita que un descuento rezagado con la misma clave se aplique después"""
+        try:
+            response = await http_client.post(
+                f"{URL_INVENTARIO}/anular_descuento",
+                headers=(*cabeceras_autorizacion(token), ("Idempotency-Key", clave))
+            )
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"Error anulando el descuento de stock de la venta {clave}: {e}")
+            return False
 
-class InventarioService:
-    """PATRON ADAPTER: Adapta comunicación con servicio de inventario"""
+class CacheReportes:
+    """PATRON ADAPTER: Invalida los reportes cacheados por servicio_reportes"""
     
     @staticmethod
-    async def actualizar_stock(producto_id: str, cantidad: int, token: str = None):
-        headers = {}
-        if token:
-            headers["Authorization"] = f"Bearer {token}"
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                # Obtener producto actual
-                producto = await ProductoService.obtener_producto(producto_id, token)
-                if not producto:
-                    return False
-                
-                nuevo_stock = producto["stock"] - cantidad
-                
-                response = await client.put(
-                    f"{configuration.INVENTORY_SERVICE_URL}/api/v1/productos/{producto_id}",
-                    headers=headers,
-                    json={"stock": nuevo_stock},
-                    timeout=30.0
-                )
-                return response.status_code == 200
-            except Exception as e:
-                print(f"Error actualizando stock: {e}")
-                return False
\ No newline at end of file
+    async def invalidar():
+        try:
+            await redis_client.delete(*CACHE_REPORTES)
+        except RedisError as e:
+            # Sin Redis los reportes caducan solos (TTL); la venta no debe fallar por esto
+            logger.warning(f"No se pudo invalidar el cache de reportes: {e}")